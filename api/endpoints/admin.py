@@ -1,49 +1,41 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Depends, Response
 from bson import ObjectId
 from db.models.admin import Admin
 from schemas.admin import AdminCreate, AdminRead, AdminUpdate
-from passlib.context import CryptContext
 from typing import List
 from db import db
+from services.passwordService import hash_password, get_pool_stats
+from services.paginationService import MAX_PAGE_SIZE, PageParams, list_documents
+from services.responseService import serializer_for
+from services.searchService import SEARCH_RESULT_LIMIT, admin_index, search_results
+from services.timingService import TimedRoute
 
-router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+router = APIRouter(route_class=TimedRoute)
+admin_serializer = serializer_for(AdminRead)
 
 @router.post("/", response_model=AdminRead)
 async def create_admin(admin: AdminCreate):
-    hashed_password = hash_password(admin.password)
+    hashed_password = await hash_password(admin.password)
     admin_data = admin.dict()
     admin_data["password"] = hashed_password
     
-    result = await db.admin_collection.insert_one(admin_data)
-    admin_data["id"] = str(result.inserted_id)
-    admin_data.pop("password")
-    return AdminRead(**admin_data)
+    await db.admin_collection.insert_one(admin_data)
+    admin_index.invalidate()
+    return admin_serializer.to_model(admin_data)
+
 
 @router.get("/", response_model=List[AdminRead])
-async def get_all_admins():
-    admins_cursor = db.admin_collection.find()
-    admins = await admins_cursor.to_list(None)
-    if admins:
-        for admin in admins:
-            admin["id"] = str(admin.pop("_id"))
-            admin.pop("password", None)
-        return [AdminRead(**admin) for admin in admins]
-    raise HTTPException(status_code=404, detail="No admins found")
+async def get_all_admins(response: Response, page: PageParams = Depends()):
+    return await list_documents(db.admin_collection, {}, page, admin_serializer, response, "No admins found")
 
 @router.get("/{admin_id}", response_model=AdminRead)
 async def get_admin(admin_id: str):
     if not ObjectId.is_valid(admin_id):
         raise HTTPException(status_code=400, detail="Invalid admin ID")
     
-    admin = await db.admin_collection.find_one({"_id": ObjectId(admin_id)})
+    admin = await db.admin_collection.find_one({"_id": ObjectId(admin_id)}, admin_serializer.projection)
     if admin:
-        admin["id"] = str(admin.pop("_id"))
-        admin.pop("password", None)
-        return AdminRead(**admin)
+        return admin_serializer.to_model(admin)
     raise HTTPException(status_code=404, detail="Admin not found")
 
 @router.put("/{admin_id}", response_model=AdminRead)
@@ -53,20 +45,19 @@ async def update_admin(admin_id: str, admin: AdminUpdate):
     
     update_data = {k: v for k, v in admin.dict().items() if v is not None}
     if "password" in update_data:
-        update_data["password"] = hash_password(update_data["password"])
+        update_data["password"] = await hash_password(update_data["password"])
     
     await db.admin_collection.update_one(
         {"_id": ObjectId(admin_id)}, 
         {"$set": update_data}
     )
     
-    updated_admin = await db.admin_collection.find_one({"_id": ObjectId(admin_id)})
+    admin_index.invalidate()
+    updated_admin = await db.admin_collection.find_one({"_id": ObjectId(admin_id)}, admin_serializer.projection)
 
 
     if updated_admin:
-        updated_admin["id"] = str(updated_admin.pop("_id"))
-        updated_admin.pop("password", None)
-        return AdminRead(**updated_admin)
+        return admin_serializer.to_model(updated_admin)
     raise HTTPException(status_code=404, detail="Admin not found")
 
 @router.delete("/{admin_id}")
@@ -76,24 +67,28 @@ async def delete_admin(admin_id: str):
     
     result = await db.admin_collection.delete_one({"_id": ObjectId(admin_id)})
     if result.deleted_count == 1:
+        admin_index.invalidate()
         return {"message": "Admin deleted successfully"}
     raise HTTPException(status_code=404, detail="Admin not found")
 
 @router.get("/search/", response_model=List[AdminRead])
-async def search_admin(full_name: str = Query(None), email: str = Query(None)):
-    if not full_name and not email:
-        raise HTTPException(status_code=400, detail="Either fullname or email must be provided")
-    
-    query = {}
-    if full_name:
-        query["full_name"] = {"$regex": full_name, "$options": "i"}  # Case-insensitive search
-    if email:
-        query["email"] = {"$regex": email, "$options": "i"}
-    
-    admins = await db.admin_collection.find(query).to_list(None)
-    if admins:
-        for admin in admins:
-            admin["id"] = str(admin.pop("_id"))
-            admin.pop("password", None)
-        return [AdminRead(**admin) for admin in admins]
-    raise HTTPException(status_code=404, detail="No matching admins found")
\ No newline at end of file
+async def search_admin(
+    q: str = Query(None, description="Beginning of the name, email or department words"),
+    full_name: str = Query(None),
+    email: str = Query(None),
+    limit: int = Query(SEARCH_RESULT_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+):
+    if not q and not full_name and not email:
+        raise HTTPException(status_code=400, detail="Either q, fullname or email must be provided")
+
+    # Word-prefix matching on the in-memory index, accent and case insensitive
+    admins = await admin_index.search_all([(None, q), ("full_name", full_name), ("email", email)], limit)
+    return search_results(admins, "No matching admins found")
+
+@router.get("/1/password-pool")
+async def get_password_pool_stats():
+    return get_pool_stats()
+
+@router.get("/1/indexes")
+async def get_index_report():
+    return await db.index_report()
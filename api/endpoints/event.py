@@ -1,37 +1,38 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException
 from bson import ObjectId
-from db.models.event import Event
 from schemas.event import EventCreate, EventRead, EventUpdate
-from typing import List
-router = APIRouter()
+from typing import List, Optional
+from db import db
+from services.eventService import event_serializer, get_event_calendar, invalidate_events
+from services.responseService import conditional_response
+from services.timingService import TimedRoute
+router = APIRouter(route_class=TimedRoute)
 
 @router.post("/", response_model=EventRead)
 async def create_event(event: EventCreate):
     event_data = event.dict()
-    result = await Event.insert_one(event_data)
-    event_data["id"] = str(result.inserted_id)
-    return EventRead(**event_data)
+    await db.event_collection.insert_one(event_data)
+    invalidate_events()
+    return event_serializer.to_model(event_data)
 
 @router.get("/", response_model=List[EventRead])
-async def get_all_tasks():
-    events = await EventRead.find().to_list()
-    if event:
-        for event in events:
-            event["id"] = str(event.pop("_id"))
-        return [EventRead(**event) for event in events]
+async def get_all_events(if_none_match: Optional[str] = Header(None)):
+    calendar = await get_event_calendar()
+    if calendar.events:
+        return conditional_response(calendar.all, if_none_match)
     raise HTTPException(status_code=404, detail="No events found")
 
 @router.get("/{event_id}", response_model=EventRead)
-async def get_event(event_id: str):
+async def get_event(event_id: str, if_none_match: Optional[str] = Header(None)):
     if not ObjectId.is_valid(event_id):
         raise HTTPException(status_code=400, detail="Invalid event ID")
 
-    event = await Event.find_one({"_id": ObjectId(event_id)})
+    calendar = await get_event_calendar()
+    event = calendar.by_id.get(str(ObjectId(event_id)))
     if event:
-        event["id"] = str(event.pop("_id"))
-        return EventRead(**event)
+        return conditional_response(event, if_none_match)
     raise HTTPException(status_code=404, detail="Event not found")
-    
+
 
 @router.put("/{event_id}", response_model=EventRead)
 async def update_event(event_id: str, event: EventUpdate):
@@ -39,11 +40,12 @@ async def update_event(event_id: str, event: EventUpdate):
         raise HTTPException(status_code=400, detail="Invalid event ID")
 
     update_data = {k: v for k, v in event.dict().items() if v is not None}
-    result = await Event.update_one({"_id": ObjectId(event_id)}, {"$set": update_data})
-    if result.modified_count == 1:
-        updated_event = await Event.find_one({"_id": ObjectId(event_id)})
-        updated_event["id"] = str(updated_event.pop("_id"))
-        return EventRead(**updated_event)
+    if update_data:
+        await db.event_collection.update_one({"_id": ObjectId(event_id)}, {"$set": update_data})
+        invalidate_events()
+    updated_event = await db.event_collection.find_one({"_id": ObjectId(event_id)}, event_serializer.projection)
+    if updated_event:
+        return event_serializer.to_model(updated_event)
     raise HTTPException(status_code=404, detail="Event not found")
 
 @router.delete("/{event_id}")
@@ -51,7 +53,8 @@ async def delete_event(event_id: str):
     if not ObjectId.is_valid(event_id):
         raise HTTPException(status_code=400, detail="Invalid event ID")
 
-    result = await Event.delete_one({"_id": ObjectId(event_id)})
+    result = await db.event_collection.delete_one({"_id": ObjectId(event_id)})
     if result.deleted_count == 1:
+        invalidate_events()
         return {"message": "Event deleted successfully"}
-    raise HTTPException(status_code=404, detail="Event not found")
\ No newline at end of file
+    raise HTTPException(status_code=404, detail="Event not found")
@@ -0,0 +1,43 @@
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import StreamingResponse
+from services.liveService import broker
+from services.timingService import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+KEEP_ALIVE_SECONDS = 15
+
+
+@router.get("/")
+async def live_updates(
+    request: Request,
+    channels: str = Query(..., description="Comma-separated channels: task:<task_id>, department:<department>, tasks, organizers"),
+):
+    """Server-Sent Events stream of compact deltas for the requested channels."""
+    channel_list = [channel.strip() for channel in channels.split(",") if channel.strip()]
+    if not channel_list:
+        raise HTTPException(status_code=400, detail="At least one channel must be provided")
+
+    subscription = broker.subscribe(channel_list)
+
+    async def events():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=KEEP_ALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(jsonable_encoder(event))}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
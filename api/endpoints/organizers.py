@@ -1,132 +1,104 @@
-from fastapi import APIRouter, HTTPException ,Query , status
+from fastapi import APIRouter, HTTPException ,Query , status, UploadFile, File, Depends, Response
 from bson import ObjectId
-import csv , os
 from db.models.organizers import Organizer
-from schemas.organizers import OrganizerCreate, OrganizerRead, OrganizerUpdate,OrganizerLoginRequest, OrganizerLoginResponse
-from passlib.context import CryptContext
+from schemas.organizers import OrganizerCreate, OrganizerRead, OrganizerUpdate,OrganizerLoginRequest, OrganizerLoginResponse, OrganizerImportReport
 from typing import List, Optional
 from db import db
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-router = APIRouter()
+from pymongo import ReturnDocument
+from services.csvImportService import import_csv
+from services.passwordService import hash_password, hash_passwords, verify_password
+from services import liveService, organizersService
+from services.paginationService import PageParams, list_documents
+from services.responseService import projection_for, serializer_for
+from services.searchService import SEARCH_RESULT_LIMIT, organizer_index, search_results
+from services.timingService import TimedRoute
+from services.loggingService import get_logger
+
+router = APIRouter(route_class=TimedRoute)
+logger = get_logger(__name__)
+organizer_serializer = serializer_for(OrganizerRead)
+login_serializer = serializer_for(OrganizerLoginResponse)
+# The hash is fetched for verification only, to_model() never copies it
+LOGIN_PROJECTION = projection_for(OrganizerLoginResponse, "password")
 
 @router.post("/login", response_model=OrganizerLoginResponse)
 async def login_organizer(login_data: OrganizerLoginRequest):
     # Find the organizer by email
-    organizer = await db.organizer_collection.find_one({"email": login_data.email})
+    organizer = await db.organizer_collection.find_one({"email": login_data.email}, LOGIN_PROJECTION)
     
     # Check if organizer exists and password matches
-    if not organizer or not verify_password(login_data.password, organizer["password"]):
+    if not organizer or not await verify_password(login_data.password, organizer["password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password"
         )
     
-    # Return organizer data (excluding password)
-    organizer_data = {k: v for k, v in organizer.items() if k != "password"}
-    organizer_data["id"] = str(organizer_data.pop("_id"))  # Convert ObjectId to string
-    
-    return OrganizerLoginResponse(**organizer_data)
+    return login_serializer.to_model(organizer)
 
 @router.post("/", response_model=OrganizerRead)
 async def create_organizer(organizer: OrganizerCreate):
-    existing_participant = await db.organizer_collection.find_one({"email": organizer.email})
+    existing_participant = await db.organizer_collection.find_one({"email": organizer.email}, {"_id": 1})
     if existing_participant:
         raise HTTPException(status_code=400, detail="Email already registered")
 
-    hashed_password = hash_password(organizer.password)
+    hashed_password = await hash_password(organizer.password)
     organizer_data = organizer.dict()
     organizer_data["password"] = hashed_password
-    result = await db.organizer_collection.insert_one(organizer_data)
-    organizer_data["id"] = str(result.inserted_id)
-    organizer_data.pop("password") 
-    return OrganizerRead(**organizer_data)
-
-
-@router.post("/import_csv", response_model=List[OrganizerRead])
-async def import_organizers_from_csv():
-    # Define file path
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(current_dir, "../../csv/organizers.csv")
-
-    if not os.path.exists(file_path):
-        raise HTTPException(
-            status_code=400, 
-            detail=f"CSV file not found at {file_path}. Please ensure organizers.csv exists."
-        )
-
-    new_organizers = []
-
-    try:
-        with open(file_path, mode="r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                organizer_data = {
-                    "full_name": row["full_name"],
-                    "email": row["email"],  # Ensure email is unique
-                    "phone": row["phone"],
-                    "status": row["status"],  # Expecting "free", "occupied", or "timeout"
-                    "department": row["department"].strip().lower(),  # Convert department to lowercase
-                    "is_absent": row.get("is_absent", "False").lower() == "true",  # Convert string to boolean
-                    "password": row["password"],  # Will be hashed
-                }
-
-                # Check if email already exists
-                existing_organizer = await db.organizer_collection.find_one({"email": organizer_data["email"]})
-                if existing_organizer:
-                    continue  # Skip duplicate emails
-                
-                # Hash the password before storing
-                organizer_data["password"] = hash_password(organizer_data["password"])
-
-                # Insert into database
-                result = await db.organizer_collection.insert_one(organizer_data)
-                organizer_data["id"] = str(result.inserted_id)
-                organizer_data.pop("password")  # Do not expose hashed password in response
-                new_organizers.append(OrganizerRead(**organizer_data))
-
-    except FileNotFoundError:
-        raise HTTPException(status_code=400, detail="Could not open CSV file")
-    except KeyError as e:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"CSV file is missing required column: {str(e)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"An error occurred while processing the CSV: {str(e)}"
-        )
+    await db.organizer_collection.insert_one(organizer_data)
+    organizer_index.invalidate()
+    return organizer_serializer.to_model(organizer_data)
+
+
+def parse_organizer_row(row: dict) -> dict:
+    return OrganizerCreate(
+        full_name=row["full_name"],
+        email=row["email"],  # Ensure email is unique
+        phone=row["phone"],
+        status=row["status"],  # Expecting "free", "occupied", or "timeout"
+        department=row["department"].strip().lower(),  # Convert department to lowercase
+        is_absent=(row.get("is_absent") or "False").lower() == "true",  # Convert string to boolean
+        password=row["password"],  # Will be hashed
+    ).dict()
+
+
+async def hash_organizer_passwords(organizers: List[dict]):
+    # Hash the whole batch in parallel on the password pool before storing
+    hashed_passwords = await hash_passwords([organizer_data["password"] for organizer_data in organizers])
+    for organizer_data, hashed_password in zip(organizers, hashed_passwords):
+        organizer_data["password"] = hashed_password
+
+
+@router.post("/import_csv", response_model=OrganizerImportReport)
+async def import_organizers_from_csv(
+    file: UploadFile = File(...),
+    chunk_size: Optional[int] = Query(None, ge=1, description="Number of organizers inserted per batch"),
+):
+    report = await import_csv(
+        file,
+        db.organizer_collection,
+        parse_organizer_row,
+        required_columns=["full_name", "email", "phone", "status", "department", "password"],
+        unique_field="email",  # Skip duplicate emails
+        prepare_documents=hash_organizer_passwords,
+        chunk_size=chunk_size,
+    )
+    organizer_index.invalidate()
 
-    return new_organizers
+    return report.to_dict([organizer_serializer.to_model(organizer_data) for organizer_data in report.inserted])
 
 
 @router.get("/", response_model=List[OrganizerRead])
-async def get_all_organizers():
-    organizers = await db.organizer_collection.find().to_list()
-    if organizers:
-        for organizer in organizers:
-            organizer["id"] = str(organizer.pop("_id"))  
-            organizer.pop("password", None)  
-        return [OrganizerRead(**organizer) for organizer in organizers]
-    raise HTTPException(status_code=404, detail="No organizers found")
+async def get_all_organizers(response: Response, page: PageParams = Depends()):
+    return await list_documents(db.organizer_collection, {}, page, organizer_serializer, response, "No organizers found")
 
 @router.get("/{organizer_id}", response_model=OrganizerRead)
 async def get_organizer(organizer_id: str):
     if not ObjectId.is_valid(organizer_id):
         raise HTTPException(status_code=400, detail="Invalid organizer ID")
 
-    organizer = await db.organizer_collection.find_one({"_id": ObjectId(organizer_id)})
+    organizer = await db.organizer_collection.find_one({"_id": ObjectId(organizer_id)}, organizer_serializer.projection)
     if organizer:
-        organizer["id"] = str(organizer.pop("_id"))
-        return OrganizerRead(**organizer)
+        return organizer_serializer.to_model(organizer)
     raise HTTPException(status_code=404, detail="Organizer not found")
 
 @router.put("/{organizer_id}", response_model=OrganizerRead)
@@ -135,12 +107,24 @@ async def update_organizer(organizer_id: str, organizer: OrganizerUpdate):
         raise HTTPException(status_code=400, detail="Invalid organizer ID")
 
     update_data = {k: v for k, v in organizer.dict().items() if v is not None}
-    result = await db.organizer_collection.update_one({"_id": ObjectId(organizer_id)}, {"$set": update_data})
-    if result.modified_count == 1:
-        updated_organizer = await db.organizer_collection.find_one({"_id": ObjectId(organizer_id)})
-        updated_organizer["id"] = str(updated_organizer.pop("_id"))
-        return OrganizerRead(**updated_organizer)
-    raise HTTPException(status_code=404, detail="Organizer not found")
+    if "password" in update_data:
+        update_data["password"] = await hash_password(update_data["password"])
+    # The document before the update gives the department the organizer may be leaving
+    previous = await db.organizer_collection.find_one_and_update(
+        {"_id": ObjectId(organizer_id)},
+        {"$set": update_data},
+        projection=organizer_serializer.projection,
+        return_document=ReturnDocument.BEFORE,
+    )
+    if previous is None:
+        raise HTTPException(status_code=404, detail="Organizer not found")
+
+    organizersService.invalidate_organizer(organizer_id)
+    updated_organizer = {**previous, **update_data}
+    live_changes = {k: v for k, v in update_data.items() if k in liveService.ORGANIZER_LIVE_FIELDS}
+    if live_changes:
+        liveService.notify_organizer(organizer_id, updated_organizer.get("department"), previous.get("department"), live_changes)
+    return organizer_serializer.to_model(updated_organizer)
 
 @router.delete("/{organizer_id}")
 async def delete_organizer(organizer_id: str):
@@ -149,15 +133,19 @@ async def delete_organizer(organizer_id: str):
 
     result = await db.organizer_collection.delete_one({"_id": ObjectId(organizer_id)})
     if result.deleted_count == 1:
+        organizersService.invalidate_organizer(organizer_id)
         return {"message": "Organizer deleted successfully"}
     raise HTTPException(status_code=404, detail="Organizer not found")
 
 
 @router.get("/1/search", response_model=List[OrganizerRead])
 async def search_organizers(
+    response: Response,
     full_name: Optional[str] = Query(None),
     status: Optional[str] = Query(None),
     department: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, description="Ranked search on the beginning of the name, email or department words"),
+    page: PageParams = Depends(),
 ):
     query = {}
  
@@ -168,47 +156,24 @@ async def search_organizers(
     if department:
         query["department"] = department
 
-    print(f"Received full_name: {full_name}, status: {status}")
-    organizers = await db.organizer_collection.find(query).to_list()
-    if organizers:
-        for organizer in organizers:
-            organizer["id"] = str(organizer.pop("_id")) 
-            organizer.pop("password", None)  
-        return [OrganizerRead(**organizer) for organizer in organizers]
-    
-    raise HTTPException(status_code=404, detail="No organizers match the search criteria")
+    logger.debug("search organizers", extra={"fields": {"q": q, "full_name": full_name, "status": status, "department": department}})
+    if q:
+        # Ranked results have no _id order to resume from, the other parameters filter them
+        if page.after is not None or page.stream:
+            raise HTTPException(status_code=400, detail="after and stream cannot be combined with q")
+        organizers = await organizer_index.search(q, page.limit or SEARCH_RESULT_LIMIT, where=query)
+        return search_results(organizers, "No organizers match the search criteria")
+    return await list_documents(db.organizer_collection, query, page, organizer_serializer, response, "No organizers match the search criteria")
 
 @router.get("/1/absent", response_model=List[OrganizerRead])
-async def get_absent_organizers():
-    organizers = await db.organizer_collection.find({"is_absent": True}).to_list()
-    if organizers:
-        for organizer in organizers:
-            organizer["id"] = str(organizer.pop("_id"))
-            organizer.pop("password", None)  
-        return [OrganizerRead(**organizer) for organizer in organizers]
-    raise HTTPException(status_code=404, detail="No absent organizers found")
+async def get_absent_organizers(response: Response, page: PageParams = Depends()):
+    return await list_documents(db.organizer_collection, {"is_absent": True}, page, organizer_serializer, response, "No absent organizers found")
 
 
 @router.get("/1/present", response_model=List[OrganizerRead])
-async def get_present_organizers():
-    organizers = await db.organizer_collection.find({"is_absent": False}).to_list()
-    if organizers:
-        for organizer in organizers:
-            organizer["id"] = str(organizer.pop("_id"))
-            organizer.pop("password", None)  
-        return [OrganizerRead(**organizer) for organizer in organizers]
-    raise HTTPException(status_code=404, detail="No present organizers found")
+async def get_present_organizers(response: Response, page: PageParams = Depends()):
+    return await list_documents(db.organizer_collection, {"is_absent": False}, page, organizer_serializer, response, "No present organizers found")
 
 @router.get("/1/statistics")
 async def get_organizer_statistics():
-    total_organizers = await db.organizer_collection.count_documents({})
-    present_organizers = await db.organizer_collection.count_documents({"is_absent": False})
-    absent_organizers = await db.organizer_collection.count_documents({"is_absent": True})
-    free_organizers = await db.organizer_collection.count_documents({"status": "free"})
-
-    return {
-        "total_organizers": total_organizers,
-        "present_organizers": present_organizers,
-        "absent_organizers": absent_organizers,
-        "free_organizers": free_organizers
-    }
+    return await organizersService.get_organizer_statistics()
@@ -1,15 +1,23 @@
 import csv
+import io
 import json
 import os
-from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import zipfile
+from typing import Iterator, List, Optional
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 from bson import ObjectId
-from schemas.participants import ParticipantCreate, ParticipantRead, ParticipantUpdate
+from schemas.participants import ParticipantCreate, ParticipantRead, ParticipantUpdate, ParticipantImportReport
 from passlib.context import CryptContext # type: ignore
 from db import db
-from starlette.responses import FileResponse
+from services.csvImportService import import_csv
+from services.rosterService import forget_participant, remember_participants
+from services.qrService import ensure_qr_codes, QR_CACHE_DIR
+from services.paginationService import MAX_PAGE_SIZE
+from services.responseService import serializer_for
+from services.searchService import SEARCH_RESULT_LIMIT, participant_index, search_results
+from starlette.responses import FileResponse, StreamingResponse
 from pathlib import Path
-import qrcode
+from services.timingService import TimedRoute
 
 
 
@@ -20,11 +28,12 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+participant_serializer = serializer_for(ParticipantRead)
 
 @router.post("/", response_model=ParticipantRead)
 async def create_participant(participant: ParticipantCreate):
-    existing_participant = await db.participant_collection.find_one({"email": participant.email})
+    existing_participant = await db.participant_collection.find_one({"email": participant.email}, {"_id": 1})
     if existing_participant:
         raise HTTPException(status_code=400, detail="Email already registered")
 
@@ -33,114 +42,123 @@ async def create_participant(participant: ParticipantCreate):
  
     
     result = await db.participant_collection.insert_one(participant_data)
+    participant_index.invalidate()
+    remember_participants([participant_data])
     participant_data["id"] = str(result.inserted_id)
   
 
     return ParticipantRead(**participant_data)
 
 
-@router.post("/export_csv")
-async def export_participants():
-    """Exports participants to a CSV file and returns the download link"""
+def write_export_csv(file, participants: List[dict], qr_paths: dict, relative_to):
+    writer = csv.writer(file)
+    writer.writerow(["full_name", "qr_code"])
+    for participant in participants:
+        participant_id = str(participant["_id"])
+        # Write relative QR code path in CSV
+        relative_qr_path = os.path.relpath(qr_paths[participant_id], relative_to)
+        writer.writerow([participant.get("full_name", "Unknown"), relative_qr_path])
 
-    # Define file paths relative to the project
-    current_dir = Path(__file__).resolve().parent
-    csv_path = current_dir / "../../csv/participants.csv"
-    qr_codes_dir = current_dir / "../../csv/qr_codes"
 
-    # Ensure QR codes directory exists
-    qr_codes_dir.mkdir(parents=True, exist_ok=True)
+class ZipStream(io.RawIOBase):
+    """Write-only sink of a ZipFile: the bytes written so far are drained into the response."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def iter_export_zip(participants: List[dict], qr_paths: dict) -> Iterator[bytes]:
+    # The sink cannot seek, so zipfile writes each entry once with a data descriptor:
+    # only the entry being written is held in memory
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, mode="w") as archive:
+        csv_file = io.StringIO()
+        write_export_csv(csv_file, participants, qr_paths, QR_CACHE_DIR.parent)
+        archive.writestr("participants.csv", csv_file.getvalue(), compress_type=zipfile.ZIP_DEFLATED)
+        yield stream.drain()
+        # PNGs are already compressed, store them as-is
+        for participant_id, qr_path in qr_paths.items():
+            archive.write(qr_path, f"{QR_CACHE_DIR.name}/{qr_path.name}", compress_type=zipfile.ZIP_STORED)
+            yield stream.drain()
+    yield stream.drain()  # Central directory
+
+
+@router.post("/export_csv")
+async def export_participants(
+    format: str = Query("csv", pattern="^(csv|zip)$", description="csv writes the export on the server, zip streams the CSV and QR codes back"),
+):
+    """Exports participants to a CSV file and returns the download link"""
 
     # Fetch all participants from MongoDB
-    participants = await db.participant_collection.find({}).to_list(length=None)
+    participants = await db.participant_collection.find({}, {"full_name": 1}).to_list(length=None)
 
     if not participants:
         raise HTTPException(status_code=404, detail="No participants found")
 
+    # QR codes are cached by participant id, only the missing ones are rendered
+    qr_paths = await ensure_qr_codes(str(participant["_id"]) for participant in participants)
+
+    if format == "zip":
+        # A sync iterator: Starlette writes each entry from its thread pool
+        return StreamingResponse(
+            iter_export_zip(participants, qr_paths),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="participants.zip"'},
+        )
+
+    # Define file paths relative to the project
+    current_dir = Path(__file__).resolve().parent
+    csv_path = current_dir / "../../csv/participants.csv"
+
     # Write participants to CSV
     with open(csv_path, mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerow(["full_name", "qr_code"])
-
-        for participant in participants:
-            full_name = participant.get("full_name", "Unknown")
-            participant_id = str(participant["_id"])
-            qr_code_path = qr_codes_dir / f"{full_name}.png"
-
-               # Generate QR Code with no border
-            qr = qrcode.QRCode(
-                version=1, 
-                error_correction=qrcode.constants.ERROR_CORRECT_L, 
-                box_size=10, 
-                border=1  # <---- No white border
-            )
-            qr.add_data(participant_id)
-            qr.make(fit=True)
-            img = qr.make_image(fill="black", back_color="white")  # Generates the image
-
-            # Save QR Code
-            img.save(qr_code_path)
-
-            # Write relative QR code path in CSV
-            relative_qr_path = os.path.relpath(qr_code_path, current_dir)
-            writer.writerow([full_name, relative_qr_path])
-
-    print(f"✅ CSV exported successfully: {csv_path}")
+        write_export_csv(file, participants, qr_paths, current_dir)
 
     return FileResponse(csv_path, filename="participants.csv", media_type="text/csv")
 
-@router.post("/import_csv", response_model=List[ParticipantRead])
-async def import_participants_from_csv():
-    # Get the current file's directory
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(current_dir, "../../csv/data.csv")
-    
-    if not os.path.exists(file_path):
-        raise HTTPException(
-            status_code=400, 
-            detail=f"CSV file not found at {file_path}. Please ensure data.csv exists in the api/endpoints directory."
-        )
-    
+def parse_participant_row(row: dict) -> dict:
+    return ParticipantCreate(
+        full_name=f"{row['firstName']} {row['lastName']}",
+        email=row["email"],
+        phone=row["phoneNumber"],
+        team=row.get("teamName", " "),  # Provide a default value if team is missing
+    ).dict()
+
+
+@router.post("/import_csv", response_model=ParticipantImportReport)
+async def import_participants_from_csv(
+    file: UploadFile = File(...),
+    chunk_size: Optional[int] = Query(None, ge=1, description="Number of participants inserted per batch"),
+):
+    report = await import_csv(
+        file,
+        db.participant_collection,
+        parse_participant_row,
+        required_columns=["firstName", "lastName", "email", "phoneNumber"],
+        unique_field="email",  # Skip emails that already exist
+        chunk_size=chunk_size,
+    )
+    participant_index.invalidate()
+    remember_participants(report.inserted)
+
     new_participants = []
-    
-    try:
-        with open(file_path, mode="r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                participant_data = {
-                    "full_name": f"{row['firstName']} {row['lastName']}",
-                    "email": row["email"],
-                    "phone": row["phoneNumber"],
-                    "team": row.get("teamName", " "),  # Provide a default value if team is missing
-                }
-                
-                # Check if email already exists
-                existing_participant = await db.participant_collection.find_one({"email": participant_data["email"]})
-                if existing_participant:
-                    continue  # Skip if email already exists
-                
-                # Insert into database
-                result = await db.participant_collection.insert_one(participant_data)
-                participant_data["id"] = str(result.inserted_id)
-                new_participants.append(ParticipantRead(**participant_data))
-                
-    except FileNotFoundError:
-        raise HTTPException(status_code=400, detail="Could not open CSV file")
-    except KeyError as e:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"CSV file is missing required column: {str(e)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"An error occurred while processing the CSV: {str(e)}"
-        )
-    
-    if not new_participants:
-        return []
-        
-    return new_participants
+    for participant_data in report.inserted:
+        participant_data["id"] = str(participant_data.pop("_id"))
+        new_participants.append(ParticipantRead(**participant_data))
+
+    return report.to_dict(new_participants)
 
 
 @router.get("/export_participants_ids")
@@ -171,16 +189,21 @@ async def export_participants_ids():
 
 
 
+@router.get("/1/search", response_model=List[ParticipantRead])
+async def search_participants(
+    q: str = Query(..., description="Beginning of the name, email or team words, e.g. \"jean du\""),
+    limit: int = Query(SEARCH_RESULT_LIMIT, ge=1, le=MAX_PAGE_SIZE),
+):
+    return search_results(await participant_index.search(q, limit), "No participants match the search")
+
 @router.get("/{participant_id}", response_model=ParticipantRead)
 async def get_participant(participant_id: str):
     if not ObjectId.is_valid(participant_id):
         raise HTTPException(status_code=400, detail="Invalid participant ID")
     
-    admin = await db.participant_collection.find_one({"_id": ObjectId(participant_id)})
+    admin = await db.participant_collection.find_one({"_id": ObjectId(participant_id)}, participant_serializer.projection)
     if admin:
-        admin["id"] = str(admin.pop("_id"))
-       
-        return ParticipantRead(**admin)
+        return participant_serializer.to_model(admin)
     raise HTTPException(status_code=404, detail="participant not found")
 
 @router.put("/{participant_id}", response_model=ParticipantRead)
@@ -196,12 +219,11 @@ async def update_participant(participant_id: str, participant: ParticipantUpdate
         {"$set": update_data}
     )
     
-    updated_participant = await db.participant_collection.find_one({"_id": ObjectId(participant_id)})
+    participant_index.invalidate()
+    updated_participant = await db.participant_collection.find_one({"_id": ObjectId(participant_id)}, participant_serializer.projection)
 
     if updated_participant:
-        updated_participant["id"] = str(updated_participant.pop("_id"))
-      
-        return ParticipantRead(**updated_participant)
+        return participant_serializer.to_model(updated_participant)
     raise HTTPException(status_code=404, detail="participant not found")
 
 @router.delete("/{participant_id}")
@@ -211,5 +233,7 @@ async def delete_participant(participant_id: str):
     
     result = await db.participant_collection.delete_one({"_id": ObjectId(participant_id)})
     if result.deleted_count == 1:
+        participant_index.invalidate()
+        forget_participant(participant_id)
         return {"message": "participant deleted successfully"}
     raise HTTPException(status_code=404, detail="Participant not found")
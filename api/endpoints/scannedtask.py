@@ -1,117 +1,139 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from bson import ObjectId
 from db.models.scannedtask import ScannedTask 
 from db.models.participants  import  Participant
-from schemas.scannedtask import ScannedTaskCreate, ScannedTaskRead, ScannedTaskUpdate
-from typing import List
+from schemas.scannedtask import ScanBatch, ScanBatchReport, ScannedTaskCreate, ScannedTaskRead, ScannedTaskUpdate, ScannedTaskStatus
+from typing import List, Optional, Union
 from schemas.participants import ParticipantRead
 from db import db
+from services.scanService import SCAN_BATCH_MAX_RECORDS, ScanClockIndexMissing, add_scans, apply_scan_batch, get_scanned_ids, set_scan_status
+from services import liveService, responseService, scanService
+from services.paginationService import peek, stream_items
+from services.responseService import FastJSONResponse, serializer_for
+from services.rosterService import unknown_participants
+from services.timingService import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+participant_serializer = serializer_for(ParticipantRead)
 
 @router.post("/", response_model=ScannedTaskRead)
 async def create_scanned_task(scanned_task: ScannedTaskCreate):
-    scanned_task_data = scanned_task.dict()
-    result = await db.scanned_task_collection.insert_one(scanned_task_data)
-    return ScannedTaskRead(**scanned_task_data)
-
-@router.put("/", response_model=ScannedTaskRead)
-async def update_scanned_status(scanned_task_update: ScannedTaskUpdate):
-    task_id = scanned_task_update.task_id
-    participant_qr = scanned_task_update.participant_qr
-    scanned = scanned_task_update.scanned
-
-    # Chercher la tâche existante
-    existing_task = await db.scanned_task_collection.find_one({"task_id": task_id})
-
-    if existing_task is None:
-        # Créer une nouvelle tâche si elle n'existe pas
-        new_task = {
-            "task_id": task_id,
-            "participant_qr": [participant_qr] if scanned else []
-        }
-        await db.scanned_task_collection.insert_one(new_task)
-        return ScannedTaskRead(**new_task)
-
-    # Mettre à jour la liste des participants
-    if scanned:
-        # Ajouter le participant s'il n'est pas déjà présent
-        if participant_qr not in existing_task["participant_qr"]:
-            await db.scanned_task_collection.update_one(
-                {"task_id": task_id},
-                {"$addToSet": {"participant_qr": participant_qr}}
-            )
-    else:
-        # Retirer le participant s'il est présent
-        if participant_qr in existing_task["participant_qr"]:
-            await db.scanned_task_collection.update_one(
-                {"task_id": task_id},
-                {"$pull": {"participant_qr": participant_qr}}
-            )
-
-    # Récupérer et retourner la tâche mise à jour
-    updated_task = await db.scanned_task_collection.find_one({"task_id": task_id})
-    if updated_task is None:
-        raise HTTPException(status_code=404, detail="Task not found after update")
-    
-    return ScannedTaskRead(**updated_task)
+    unknown = await unknown_participants(scanned_task.participant_qr)
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Participants not found: {', '.join(sorted(unknown))}")
+    participant_qr = await add_scans(scanned_task.task_id, scanned_task.participant_qr)
+    return ScannedTaskRead(task_id=scanned_task.task_id, participant_qr=participant_qr)
+
+@router.put("/", response_model=Union[ScannedTaskStatus, ScannedTaskRead])
+async def update_scanned_status(
+    scanned_task_update: ScannedTaskUpdate,
+    lightweight: bool = Query(False, description="Only return the scanned flag and the scanned count"),
+):
+    # Un-scanning stays possible for a participant deleted since
+    if scanned_task_update.scanned and await unknown_participants([scanned_task_update.participant_qr]):
+        raise HTTPException(status_code=404, detail="Participant not found")
+
+    task = await set_scan_status(
+        scanned_task_update.task_id,
+        scanned_task_update.participant_qr,
+        scanned_task_update.scanned,
+        lightweight=lightweight,
+    )
+    liveService.notify_scan(scanned_task_update.task_id, scanned_task_update.participant_qr, scanned_task_update.scanned)
+    if lightweight:
+        return ScannedTaskStatus(**task)
+    return ScannedTaskRead(**task)
+
+
+@router.post("/batch", response_model=ScanBatchReport)
+async def apply_scanned_batch(batch: ScanBatch):
+    """
+    Replays the scans recorded by a device while offline, in one request.
+    The newest client_timestamp of a (task_id, participant_qr) wins; each record gets its own status.
+    """
+    if not scanService.OFFLINE_SCAN_BATCHES:
+        # Live scans only stamp the clocks batches are ordered against when batches are enabled
+        raise HTTPException(status_code=404, detail="Offline scan batches are disabled (OFFLINE_SCAN_BATCHES=true)")
+    if len(batch.records) > SCAN_BATCH_MAX_RECORDS:
+        raise HTTPException(status_code=400, detail=f"A batch accepts at most {SCAN_BATCH_MAX_RECORDS} records")
+
+    unknown = await unknown_participants({record.participant_qr for record in batch.records if record.scanned})
+    rejected = {
+        index: "Participant not found"
+        for index, record in enumerate(batch.records) if record.scanned and record.participant_qr in unknown
+    }
+    try:
+        results = await apply_scan_batch([record.dict() for record in batch.records], rejected)
+    except ScanClockIndexMissing as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    for result in results:
+        if result["status"] == "applied":
+            liveService.notify_scan(result["task_id"], result["participant_qr"], batch.records[result["index"]].scanned)
+
+    counts = {status: 0 for status in ("applied", "stale", "duplicate", "error")}
+    for result in results:
+        counts[result["status"]] += 1
+    return ScanBatchReport(
+        applied_count=counts["applied"],
+        stale_count=counts["stale"],
+        duplicate_count=counts["duplicate"],
+        error_count=counts["error"],
+        results=results,
+    )
+
+
+PARTICIPANT_STATUS_FIELDS = ("full_name", "email", "phone", "team")
+DEFAULT_STATUS_FIELDS = ("full_name", "email", "phone")
 
 
 @router.get("/{task_id}", response_model=List[dict])  
-async def get_all_participants_with_scan_status(task_id: str):
-    # Retrieve all participants
-    participants = await db.participant_collection.find().to_list(length=None)
-
-    if not participants:
+async def get_all_participants_with_scan_status(
+    task_id: str,
+    skip: int = Query(0, ge=0, description="Number of participants to skip"),
+    limit: Optional[int] = Query(None, ge=1, description="Maximum number of participants to return"),
+    fields: Optional[str] = Query(None, description="Comma-separated participant fields to include"),
+    stream: bool = Query(False, description="Stream the participants as NDJSON instead of a JSON array"),
+):
+    if fields:
+        selected_fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown_fields = [field for field in selected_fields if field not in PARTICIPANT_STATUS_FIELDS]
+        if unknown_fields:
+            raise HTTPException(status_code=400, detail=f"Unknown participant fields: {', '.join(unknown_fields)}")
+    else:
+        selected_fields = list(DEFAULT_STATUS_FIELDS)
+
+    # Load the scanned set for this task once instead of one lookup per participant
+    scanned_ids = set(await get_scanned_ids(task_id))
+
+    # Only fetch the requested fields and consume the cursor as it is produced
+    cursor = db.participant_collection.find({}, {field: 1 for field in selected_fields}).sort("_id", 1).skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
+
+    async def participants_with_status():
+        async for participant in cursor:
+            participant_id = str(participant["_id"])
+            participant_data = {"task_id": task_id, "participant_qr": participant_id}
+            for field in selected_fields:
+                participant_data[field] = participant.get(field)
+            participant_data["scanned"] = participant_id in scanned_ids
+            yield participant_data
+
+    # Rows are encoded as the cursor produces them, never gathered in one list
+    # A page past the end is an empty listing, only an empty collection is a 404
+    first, rows = await peek(participants_with_status())
+    if first is None and not skip:
         raise HTTPException(status_code=404, detail="No participants found")
-
-    participants_with_status = []
-
-    for participant in participants:
-        participant_id = str(participant["_id"])
-
-        # Check if the participant exists in the scanned_task_collection
-        scanned_task = await db.scanned_task_collection.find_one({
-            "task_id": task_id,
-            "participant_qr": participant_id
-        })
-
-        participant_data = {
-            "task_id": task_id,
-            "participant_qr": participant_id,
-            "full_name": participant["full_name"],
-            "email": participant["email"],
-            "phone": participant["phone"],
-            "scanned": True if scanned_task else False
-        }
-
-        participants_with_status.append(participant_data)
-
-    return participants_with_status
+    return stream_items(rows, ndjson=stream)
 
 
 @router.get("/{task_id}/scanned", response_model=List[ParticipantRead])
 async def get_scanned_participants(task_id: str):
-    scanned_participants = await db.scanned_task_collection.find({"task_id": task_id, "scanned": True}).to_list()
+    # One $in query for the scanned ids instead of one find_one per id
+    participant_ids = [ObjectId(participant_id) for participant_id in await get_scanned_ids(task_id) if ObjectId.is_valid(participant_id)]
+    cursor = db.participant_collection.find({"_id": {"$in": participant_ids}}, participant_serializer.projection)
+    participants = [participant_serializer.to_dict(document) async for document in cursor]
 
-    if not scanned_participants:
+    if not participants:
         raise HTTPException(status_code=404, detail="No scanned participants found")
-
-    participants_with_details = []
-
-    for scanned_task in scanned_participants:
-        participant_id = scanned_task.get("participant_qr")
-        participant = await db.participant_collection.find_one({"_id": ObjectId(participant_id)})
-        if participant:
-            participant_data = {
-                "id": str(participant["id"]),
-                "full_name": participant["full_name"],
-                "email": participant["email"],
-                "phone": participant["phone"],
-            }
-            participants_with_details.append(ParticipantRead(**participant_data))
-        else:
-            continue
-
-    return participants_with_details
-
+    return FastJSONResponse(participants) if responseService.FAST_JSON_RESPONSES else participants
@@ -1,29 +1,66 @@
-from fastapi import APIRouter, HTTPException
-from bson import ObjectId
-from db.models.supervisortask import SupervisorTask
+from fastapi import APIRouter, Depends, HTTPException, Response
 from schemas.supervisortask import SupervisorTaskCreate, SupervisorTaskRead
 from typing import List
+from db import db
+from services import tasksService
+from services.paginationService import PageParams, list_documents
+from services.timingService import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+
+# Supervisors are stored in the supervisor_id array of the assigned tasks, so
+# this router reads and writes assigned_tasks; the multikey supervisor_id index
+# answers "which tasks does this supervisor oversee" in one query.
+
+
+class SupervisedTasks:
+    """Maps the assigned tasks of one supervisor to SupervisorTaskRead items for list_documents."""
+
+    projection = {"task_id": 1}
+
+    def __init__(self, supervisor_id: str):
+        self.supervisor_id = supervisor_id
+
+    def to_dict(self, assignment: dict) -> dict:
+        return {"task_id": assignment["task_id"], "supervisor_id": self.supervisor_id}
+
+    def to_model(self, assignment: dict) -> SupervisorTaskRead:
+        return SupervisorTaskRead(**self.to_dict(assignment))
 
-router = APIRouter()
 
 @router.post("/", response_model=SupervisorTaskRead)
 async def create_supervisor_task(supervisor_task: SupervisorTaskCreate):
     supervisor_task_data = supervisor_task.dict()
-    result = await SupervisorTask.insert_one(supervisor_task_data)
+    result = await db.assigned_task_collection.update_one(
+        {"task_id": supervisor_task_data["task_id"], "supervisor_id": {"$type": "array"}},
+        {"$addToSet": {"supervisor_id": supervisor_task_data["supervisor_id"]}}
+    )
+    if result.matched_count == 0:
+        # Assigned tasks created without supervisors store supervisor_id as null
+        result = await db.assigned_task_collection.update_one(
+            {"task_id": supervisor_task_data["task_id"]},
+            {"$set": {"supervisor_id": [supervisor_task_data["supervisor_id"]]}}
+        )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="No assigned task found for this task")
+    if result.modified_count == 1:
+        tasksService.invalidate_schedules({supervisor_task_data["supervisor_id"]})
     return SupervisorTaskRead(**supervisor_task_data)
 
 @router.get("/{task_id}", response_model=List[SupervisorTaskRead])
 async def get_assigned_task(task_id: str):
-    tasks = await SupervisorTask.find({"task_id": task_id}).to_list()
-    if tasks: 
-        return [SupervisorTaskRead(**task) for task in tasks]
+    task = await db.assigned_task_collection.find_one({"task_id": task_id}, {"supervisor_id": 1})
+    if task and task.get("supervisor_id"):
+        return [SupervisorTaskRead(task_id=task_id, supervisor_id=supervisor_id) for supervisor_id in task["supervisor_id"]]
     raise HTTPException(status_code=404, detail="No supervisor found for this task")
 
 @router.get("/organizer/{organizer_id}", response_model=List[SupervisorTaskRead])
-async def get_tasks_by_organizer(organizer_id: int):
-    tasks = await SupervisorTask.find({"organizer_id": organizer_id}).to_list()
-    if tasks:
-        return [SupervisorTaskRead(**task) for task in tasks]
-    raise HTTPException(status_code=404, detail="No supervision tasks found for this organizer")
-
-
+async def get_tasks_by_organizer(organizer_id: str, response: Response, page: PageParams = Depends()):
+    return await list_documents(
+        db.assigned_task_collection,
+        {"supervisor_id": organizer_id},
+        page,
+        SupervisedTasks(organizer_id),
+        response,
+        "No supervision tasks found for this organizer",
+    )
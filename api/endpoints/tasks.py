@@ -1,35 +1,36 @@
-from fastapi import APIRouter, HTTPException , Query
+from fastapi import APIRouter, HTTPException , Query, UploadFile, File, Depends, Response
 from bson import ObjectId
 from db.models.tasks import Task
-from schemas.tasks import TaskCreate, TaskRead, TaskUpdate
-from typing import List
+from schemas.tasks import TaskCreate, TaskRead, TaskUpdate, TaskImportReport
+from typing import List, Optional
 from datetime import date, datetime , time
 from db import db
-import os
-import csv
+from services.csvImportService import import_csv, chunked, DEFAULT_CHUNK_SIZE
+from services import liveService, tasksService
+from services.paginationService import PageParams, list_documents
+from services.responseService import serializer_for
+from services.searchService import SEARCH_RESULT_LIMIT, task_index, search_results
+from services.timingService import TimedRoute
+from services.loggingService import get_logger
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+logger = get_logger(__name__)
 
 @router.post("/", response_model=TaskRead)
 async def create_task(task: TaskCreate):
     task_data = task.dict()
     result = await db.task_collection.insert_one(task_data)
+    task_index.invalidate()
     task_data["id"] = str(result.inserted_id)
     return TaskRead(**task_data)
 
+task_serializer = serializer_for(TaskRead)
+
+
 @router.get("/", response_model=List[TaskRead])
-async def get_all_tasks():
-    tasks = await db.task_collection.find().to_list(length=None)
-    print("Raw tasks from DB:", tasks)  # Debug print
-    if tasks:
-        transformed_tasks = []
-        for task in tasks:
-            task["id"] = str(task["_id"])
-            del task["_id"]
-            transformed_tasks.append(task)
-        print("Transformed tasks:", transformed_tasks)  # Debug print
-        return [TaskRead(**task) for task in transformed_tasks]
-    raise HTTPException(status_code=404, detail="No tasks found")
+async def get_all_tasks(response: Response, page: PageParams = Depends()):
+    logger.debug("list tasks", extra={"fields": {"limit": page.limit, "after": str(page.after) if page.after else None, "stream": page.stream}})
+    return await list_documents(db.task_collection, {}, page, task_serializer, response, "No tasks found")
 
 
 @router.get("/{task_id}", response_model=TaskRead)
@@ -37,10 +38,9 @@ async def get_task(task_id: str):
     if not ObjectId.is_valid(task_id):
         raise HTTPException(status_code=400, detail="Invalid task ID")
 
-    task = await db.task_collection.find_one({"_id": ObjectId(task_id)})
+    task = await db.task_collection.find_one({"_id": ObjectId(task_id)}, task_serializer.projection)
     if task:
-        task["id"] = str(task.pop("_id"))
-        return TaskRead(**task)
+        return task_serializer.to_model(task)
     raise HTTPException(status_code=404, detail="Task not found")
 
 @router.put("/{task_id}", response_model=TaskRead)
@@ -53,10 +53,9 @@ async def update_task(task_id: str, task: TaskUpdate):
 
     # If no valid fields are provided for update, return the existing task
     if not update_data:
-        existing_task = await db.task_collection.find_one({"_id": ObjectId(task_id)})
+        existing_task = await db.task_collection.find_one({"_id": ObjectId(task_id)}, task_serializer.projection)
         if existing_task:
-            existing_task["id"] = str(existing_task.pop("_id"))
-            return TaskRead(**existing_task)
+            return task_serializer.to_model(existing_task)
         else:
             raise HTTPException(status_code=404, detail="Task not found")
 
@@ -68,112 +67,86 @@ async def update_task(task_id: str, task: TaskUpdate):
 
     # Return the updated task
     if result.modified_count == 1:
-        updated_task = await db.task_collection.find_one({"_id": ObjectId(task_id)})
-        updated_task["id"] = str(updated_task.pop("_id"))
-        return TaskRead(**updated_task)
+        await tasksService.invalidate_task_schedules(task_id)
+        task_index.invalidate()
+        liveService.notify_task(task_id, update_data)
+        updated_task = await db.task_collection.find_one({"_id": ObjectId(task_id)}, task_serializer.projection)
+        return task_serializer.to_model(updated_task)
 
     # If the task was not found, raise a 404 error
     raise HTTPException(status_code=404, detail="Task not found")
 
 
 
-@router.post("/import_csv", response_model=List[TaskRead])
-async def import_tasks_from_csv():
-    # Define file path
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    file_path = os.path.join(current_dir, "../../csv/day3.csv")
+# Supervisor and organizer ID
+IMPORT_SUPERVISOR_ID = "67b2d9a965c4c7c2d7c0b6e1"
+IMPORT_ORGANIZER_ID = "67b2d9a965c4c7c2d7c0b6e1"
+
+
+def parse_task_row(row: dict) -> dict:
+    # Parse day (assuming DAY is an integer representing the day of the month)
+    # Map DAY = 1 to 20/02/2025
+    day = date(2025, 2, 22) 
+
+    # Parse start_time
+    start_time = datetime.strptime(row["start_time"], "%H:%M").time()
 
-    if not os.path.exists(file_path):
-        raise HTTPException(
-            status_code=400, 
-            detail=f"CSV file not found at {file_path}. Please ensure tasks.csv exists."
-        )
+    # Combine date and time into datetime objects
+    start_datetime = datetime.combine(day, start_time)
+    end_datetime = datetime.combine(day, start_time)
+    day_datetime = datetime.combine(day, time.min)  # time.min is 00:00:00
+
+    # Handle is_check_in (default to False if empty)
+    is_check_in = (
+        row.get("is_check_in", "False").lower() == "true"
+        if (row.get("is_check_in") or "").strip()
+        else False
+    )
+
+    return TaskCreate(
+        name=row["name"],
+        start_time=start_datetime,
+        end_time=end_datetime,
+        day=day_datetime,
+        location=row["location"].replace("\n", " ").strip(),  # Handle multi-line values
+        description=row["description"].replace("\n", " ").strip(),  # Handle multi-line values
+        is_complete=False,  # Default to False
+        is_check_in=is_check_in,  # Use the parsed or default value
+    ).dict()
+
+
+@router.post("/import_csv", response_model=TaskImportReport)
+async def import_tasks_from_csv(
+    file: UploadFile = File(...),
+    chunk_size: Optional[int] = Query(None, ge=1, description="Number of tasks inserted per batch"),
+):
+    report = await import_csv(
+        file,
+        db.task_collection,
+        parse_task_row,
+        required_columns=["name", "start_time", "location", "description"],
+        chunk_size=chunk_size,
+    )
+    task_index.invalidate()
 
     new_tasks = []
-    task_ids = []  # To store IDs of inserted tasks
-
-    # Supervisor and organizer ID
-    supervisor_id = "67b2d9a965c4c7c2d7c0b6e1"
-    organizer_id = "67b2d9a965c4c7c2d7c0b6e1"
-
-    try:
-        with open(file_path, mode="r", encoding="utf-8") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                # Parse day (assuming DAY is an integer representing the day of the month)
-                # Map DAY = 1 to 20/02/2025
-                day = date(2025, 2, 22) 
-
-                # Parse start_time
-                start_time = datetime.strptime(row["start_time"], "%H:%M").time()
-
-                # Parse end_time (default to start_time if not available or malformed)
-              
-               
-
-                # Combine date and time into datetime objects
-                start_datetime = datetime.combine(day, start_time)
-                end_datetime = datetime.combine(day, start_time)
-                day_datetime = datetime.combine(day, time.min)  # time.min is 00:00:00
-
-                # Handle is_check_in (default to False if empty)
-                is_check_in = (
-                    row.get("is_check_in", "False").lower() == "true"
-                    if row.get("is_check_in", "").strip()
-                    else False
-                )
-
-                # Create task data
-                task_data = {
-                    "name": row["name"],
-                    "start_time": start_datetime,
-                    "end_time": end_datetime,
-                    "day": day_datetime,
-                    "location": row["location"].replace("\n", " ").strip(),  # Handle multi-line values
-                    "description": row["description"].replace("\n", " ").strip(),  # Handle multi-line values
-                    "is_complete": False,  # Default to False
-                    "is_check_in": is_check_in,  # Use the parsed or default value
-                }
-
-                # Insert into task_collection
-                result = await db.task_collection.insert_one(task_data)
-                task_id = str(result.inserted_id)
-                task_data["id"] = task_id
-                task_ids.append(task_id)  # Store the task ID
-
-                # Append to new_tasks
-                new_tasks.append(TaskRead(**task_data))
-
-        # Assign tasks to supervisor and organizer
-        for task_id in task_ids:
-            assigned_task_data = {
-                "task_id": task_id,
-                "organizer_id": [organizer_id],  # List of organizer IDs
-                "supervisor_id": [supervisor_id],  # List of supervisor IDs
-            }
-
-            # Insert into assigned_task_collection
-            await db.assigned_task_collection.insert_one(assigned_task_data)
-
-    except FileNotFoundError:
-        raise HTTPException(status_code=400, detail="Could not open CSV file")
-    except KeyError as e:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"CSV file is missing required column: {str(e)}"
-        )
-    except ValueError as e:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Invalid data format in CSV file: {str(e)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=500, 
-            detail=f"An error occurred while processing the CSV: {str(e)}"
-        )
-
-    return new_tasks
+    assigned_tasks = []
+    for task_data in report.inserted:
+        task_data["id"] = str(task_data.pop("_id"))
+        new_tasks.append(TaskRead(**task_data))
+        assigned_tasks.append({
+            "task_id": task_data["id"],
+            "organizer_id": [IMPORT_ORGANIZER_ID],  # List of organizer IDs
+            "supervisor_id": [IMPORT_SUPERVISOR_ID],  # List of supervisor IDs
+        })
+
+    # Assign the imported tasks to the supervisor and organizer in batches
+    for chunk in chunked(assigned_tasks, chunk_size or DEFAULT_CHUNK_SIZE):
+        await db.assigned_task_collection.insert_many(chunk, ordered=False)
+    if assigned_tasks:
+        tasksService.invalidate_schedules([IMPORT_ORGANIZER_ID, IMPORT_SUPERVISOR_ID])
+
+    return report.to_dict(new_tasks)
 
 @router.delete("/{task_id}")
 async def delete_task(task_id: str):
@@ -183,10 +156,13 @@ async def delete_task(task_id: str):
     # Delete the main task
     task_result = await db.task_collection.delete_one({"_id": ObjectId(task_id)})
 
-    # Delete any assigned tasks related to this task
+    # Delete any assigned tasks related to this task, then drop the schedules that listed it
+    members = await tasksService.task_members(task_id)
     assigned_task_result = await db.assigned_task_collection.delete_many({"task_id": task_id})
+    tasksService.invalidate_schedules(members)
 
     if task_result.deleted_count == 1:
+        task_index.invalidate()
         return {
             "message": "Task deleted successfully",
         }
@@ -196,11 +172,20 @@ async def delete_task(task_id: str):
 
 @router.get("/1/search", response_model=List[TaskRead])
 async def search_tasks(
+    response: Response,
     name: str = Query(None, description="Search by task name"),
     start_time: datetime = Query(None, description="Start time of the task"),
     end_time: datetime = Query(None, description="End time of the task"),
-    day: datetime = Query(None, description="Specific day of the task")
+    day: datetime = Query(None, description="Specific day of the task"),
+    q: Optional[str] = Query(None, description="Ranked search on the beginning of the name, location or description words"),
+    page: PageParams = Depends(),
 ):
+    if q:
+        if start_time or end_time or day or page.after is not None or page.stream:
+            raise HTTPException(status_code=400, detail="start_time, end_time, day, after and stream cannot be combined with q")
+        tasks = await task_index.search(q, page.limit or SEARCH_RESULT_LIMIT, where={"name": name} if name else None)
+        return search_results(tasks, "No tasks found matching the criteria")
+
     query = {}
 
     if name:
@@ -212,54 +197,23 @@ async def search_tasks(
     if day:
         query["day"] = day  
 
-    tasks = await db.task_collection.find(query).to_list()
-    if tasks:
-        for task in tasks:
-            task["id"] = str(task.pop("_id")) 
-        return [TaskRead(**task) for task in tasks]
-
-    raise HTTPException(status_code=404, detail="No tasks found matching the criteria")
+    return await list_documents(db.task_collection, query, page, task_serializer, response, "No tasks found matching the criteria")
 
 @router.get("/1/unfinished", response_model=List[TaskRead])
-async def get_unfinished_tasks():
-    tasks = await db.task_collection.find({"is_complete": False}).to_list()
-    if tasks:
-        for task in tasks:
-            task["id"] = str(task.pop("_id"))  
-        return [TaskRead(**task) for task in tasks]
-
-    raise HTTPException(status_code=404, detail="No unfinished tasks found")
+async def get_unfinished_tasks(response: Response, page: PageParams = Depends()):
+    return await list_documents(db.task_collection, {"is_complete": False}, page, task_serializer, response, "No unfinished tasks found")
 
 from datetime import datetime
 
 @router.get("/1/late", response_model=List[TaskRead])
-async def get_late_tasks():
+async def get_late_tasks(response: Response, page: PageParams = Depends()):
     current_time = datetime.utcnow()
-    tasks = await db.task_collection.find({
+    query = {
         "is_complete": False,
         "end_time": {"$lt": current_time}
-    }).to_list()
-
-    if tasks:
-        for task in tasks:
-            task["id"] = str(task.pop("_id")) 
-        return [TaskRead(**task) for task in tasks]
-
-    raise HTTPException(status_code=404, detail="No late tasks found")
+    }
+    return await list_documents(db.task_collection, query, page, task_serializer, response, "No late tasks found")
 
 @router.get("/1/statistics")
 async def get_task_statistics():
-    total_tasks = await db.task_collection.count_documents({})
-    finished_tasks = await db.task_collection.count_documents({"is_complete": True})
-    late_tasks = await db.task_collection.count_documents({
-        "is_complete": False,
-        "end_time": {"$lt": datetime.utcnow()}
-    })
-    progress = (finished_tasks / total_tasks) * 100 if total_tasks > 0 else 0
-
-    return {
-        "total_tasks": total_tasks,
-        "finished_tasks": finished_tasks,
-        "late_tasks": late_tasks,
-        "progress": round(progress, 2)  
-    }
+    return await tasksService.get_task_statistics()
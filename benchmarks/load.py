@@ -0,0 +1,313 @@
+"""
+Load test of the real FastAPI app (main.py) through an in-process ASGI client.
+
+Seeds participants, organizers, tasks, assignments and scans, then runs each
+scenario with concurrent virtual users and reports p50/p95/p99 latency and
+database queries per request (from the X-DB-Queries header).
+
+    python -m benchmarks.load                                  # mongomock stand-in
+    python -m benchmarks.load --mongo-url mongodb://localhost:27017 --users 100
+
+With --mongo-url the data goes to a separate database (--database, dropped
+before and after the run). The stand-in runs every query on the event loop:
+use it for query counts and application overhead, and a real mongod for
+latency figures.
+"""
+import argparse
+import asyncio
+import io
+import itertools
+import math
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from db.monitoring import assert_max_queries
+
+SCENARIOS = ("scan", "my_tasks", "dashboard", "imports")
+
+FIRST_NAMES = ["Amine", "Sarah", "Yacine", "Lina", "Mohamed", "Ines", "Karim", "Nour", "Hélène", "Rayan"]
+LAST_NAMES = ["Benali", "Haddad", "Bouzid", "Mansouri", "Cherif", "Kaci", "Saidi", "Meziane"]
+DEPARTMENTS = ["dev", "design", "logistics", "communication", "relex"]
+LOCATIONS = ["Main hall", "Amphi A", "Amphi B", "Room 12", "Entrance"]
+
+_unique = itertools.count()
+
+
+def full_name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+class Dataset:
+    def __init__(self):
+        self.participant_ids: List[str] = []
+        self.organizer_ids: List[str] = []
+        self.task_ids: List[str] = []
+
+
+async def seed(args, rng: random.Random) -> Dataset:
+    from db import db
+    from services.passwordService import pwd_context
+    from services.scanService import uses_scan_documents
+
+    data = Dataset()
+    participants = [
+        {"full_name": full_name(rng), "email": f"participant{i}@example.com", "phone": f"0550{i:06d}", "team": f"team-{i % 100}"}
+        for i in range(args.participants)
+    ]
+    await db.participant_collection.insert_many(participants)
+    data.participant_ids = [str(participant["_id"]) for participant in participants]
+
+    password = pwd_context.hash("password")  # One hash for everybody, bcrypt is slow on purpose
+    organizers = [
+        {
+            "full_name": full_name(rng), "email": f"organizer{i}@example.com", "phone": f"0660{i:06d}", "password": password,
+            "status": rng.choice(["free", "occupied"]), "department": rng.choice(DEPARTMENTS), "is_absent": rng.random() < 0.1,
+        }
+        for i in range(args.organizers)
+    ]
+    await db.organizer_collection.insert_many(organizers)
+    data.organizer_ids = [str(organizer["_id"]) for organizer in organizers]
+
+    start = datetime(2025, 2, 20, 8)
+    tasks = []
+    for i in range(args.tasks):
+        task_start = start + timedelta(days=i % 3, minutes=30 * (i % 20))
+        tasks.append({
+            "name": f"Task {i}", "start_time": task_start, "end_time": task_start + timedelta(hours=1),
+            "day": task_start.replace(hour=0, minute=0), "location": rng.choice(LOCATIONS),
+            "description": "Benchmark task", "is_complete": rng.random() < 0.3, "is_check_in": i % 10 == 0,
+        })
+    await db.task_collection.insert_many(tasks)
+    data.task_ids = [str(task["_id"]) for task in tasks]
+
+    await db.assigned_task_collection.insert_many([
+        {"task_id": task_id, "organizer_id": rng.sample(data.organizer_ids, min(3, len(data.organizer_ids))), "supervisor_id": [rng.choice(data.organizer_ids)]}
+        for task_id in data.task_ids
+    ])
+
+    scans = {task_id: rng.sample(data.participant_ids, min(args.scans_per_task, len(data.participant_ids))) for task_id in data.task_ids}
+    if uses_scan_documents():
+        await db.scan_collection.insert_many([
+            {"task_id": task_id, "participant_qr": qr} for task_id, qrs in scans.items() for qr in qrs
+        ])
+    else:
+        await db.scanned_task_collection.insert_many([{"task_id": task_id, "participant_qr": qrs} for task_id, qrs in scans.items()])
+    return data
+
+
+def participants_csv(rows: int) -> bytes:
+    lines = ["firstName,lastName,email,phoneNumber"]
+    for _ in range(rows):
+        n = next(_unique)
+        lines.append(f"Import,Participant {n},import{n}-{os.getpid()}@example.com,0770{n:06d}")
+    return "\n".join(lines).encode()
+
+
+def tasks_csv(rows: int) -> bytes:
+    lines = ["name,start_time,location,description"]
+    for _ in range(rows):
+        n = next(_unique)
+        lines.append(f"Imported task {n},{8 + n % 10:02d}:00,Main hall,Imported by the benchmark")
+    return "\n".join(lines).encode()
+
+
+def organizers_csv(rows: int) -> bytes:
+    lines = ["full_name,email,phone,status,department,password"]
+    for _ in range(rows):
+        n = next(_unique)
+        lines.append(f"Imported Organizer {n},imported{n}-{os.getpid()}@example.com,0661{n:06d},free,dev,secret{n}")
+    return "\n".join(lines).encode()
+
+
+def query_budgets(args) -> Dict[str, int]:
+    """Most MongoDB commands one request of each route may issue, enforced by --check-queries."""
+    from services import scanService
+    from services.csvImportService import DEFAULT_CHUNK_SIZE
+
+    chunks = math.ceil(args.import_rows / DEFAULT_CHUNK_SIZE)
+    organizer_chunks = math.ceil(max(args.import_rows // 50, 1) / DEFAULT_CHUNK_SIZE)
+    return {
+        # One find_one_and_update, plus a retry after a concurrent upsert; offline batches stamp the clock first
+        "PUT /scanned-tasks/": 3 if scanService.OFFLINE_SCAN_BATCHES else 2,
+        "GET /assigned-tasks/organizer/{id}": 1,
+        "GET /tasks/1/statistics": 1,
+        "GET /organizers/1/statistics": 1,
+        "POST /participants/import_csv": 1 + chunks,  # One $in for the duplicates, one insert_many per chunk
+        "POST /organizers/import_csv": 1 + organizer_chunks,
+        "POST /tasks/import_csv": 2 * chunks,  # Tasks and their assignments
+    }
+
+
+def route_pattern(method: str, path: str) -> str:
+    # Ids in the path would make one line per document
+    return f"{method} {re.sub(r'/[0-9a-f]{24}', '/{id}', path)}"
+
+
+def scenario_requests(args, data: Dataset) -> Dict[str, Callable]:
+    """One function per scenario, each issues one request of a virtual user."""
+
+    async def scan(client, rng):
+        return await client.put(f"/scanned-tasks/?lightweight={str(args.lightweight_scans).lower()}", json={
+            "task_id": rng.choice(data.task_ids),
+            "participant_qr": rng.choice(data.participant_ids),
+            "scanned": rng.random() < 0.9,
+        })
+
+    async def my_tasks(client, rng):
+        return await client.get(f"/assigned-tasks/organizer/{rng.choice(data.organizer_ids)}")
+
+    async def dashboard(client, rng):
+        return await client.get(rng.choice(["/tasks/1/statistics", "/organizers/1/statistics"]))
+
+    async def imports(client, rng):
+        kind = rng.choice(["participants", "tasks", "organizers"])
+        if kind == "participants":
+            content = participants_csv(args.import_rows)
+        elif kind == "tasks":
+            content = tasks_csv(args.import_rows)
+        else:
+            content = organizers_csv(max(args.import_rows // 50, 1))  # Every row is a bcrypt hash
+        return await client.post(f"/{kind}/import_csv", files={"file": (f"{kind}.csv", io.BytesIO(content), "text/csv")})
+
+    return {"scan": scan, "my_tasks": my_tasks, "dashboard": dashboard, "imports": imports}
+
+
+class Sample:
+    __slots__ = ("route", "status", "latency", "queries")
+
+    def __init__(self, route: str, status: int, latency: float, queries):
+        self.route = route
+        self.status = status
+        self.latency = latency
+        self.queries = queries
+
+
+async def run_scenario(client, request: Callable, users: int, duration: float, seed_value: int, budgets: Optional[Dict[str, int]], violations: Dict[str, str]) -> List[Sample]:
+    samples: List[Sample] = []
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user(number: int):
+        rng = random.Random(seed_value + number)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await request(client, rng)
+            latency = time.perf_counter() - start
+            queries = response.headers.get("x-db-queries")
+            route = route_pattern(response.request.method, response.request.url.path)
+            samples.append(Sample(route, response.status_code, latency, int(queries) if queries is not None else None))
+            if budgets and route in budgets:
+                try:
+                    assert_max_queries(response, budgets[route], route)
+                except AssertionError as e:
+                    violations.setdefault(route, str(e))
+
+    await asyncio.gather(*(virtual_user(number) for number in range(users)))
+    return samples
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(max(math.ceil(p / 100 * len(sorted_values)) - 1, 0), len(sorted_values) - 1)]
+
+
+def report(name: str, samples: List[Sample], duration: float):
+    print(f"\n== {name}: {len(samples)} requests in {duration:.1f} s ({len(samples) / duration:.1f} req/s)")
+    print(f"{'route':<44} {'count':>6} {'4xx':>5} {'5xx':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    by_route = defaultdict(list)
+    for sample in samples:
+        by_route[sample.route].append(sample)
+    for route, route_samples in sorted(by_route.items()):
+        latencies = sorted(sample.latency * 1000 for sample in route_samples)
+        # 4xx are often expected (e.g. an organizer without tasks), 5xx never are
+        client_errors = sum(1 for sample in route_samples if 400 <= sample.status < 500)
+        server_errors = sum(1 for sample in route_samples if sample.status >= 500)
+        counted = [sample.queries for sample in route_samples if sample.queries is not None]
+        queries = f"{sum(counted) / len(counted):.1f}" if counted else "-"
+        print(
+            f"{route:<44} {len(route_samples):>6} {client_errors:>5} {server_errors:>5} {percentile(latencies, 50):>8.1f} "
+            f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} {queries:>8}"
+        )
+
+
+async def main_async(args):
+    import httpx
+    from db import db
+    from main import app
+    from services import rosterService
+
+    db.DATABASE_NAME = args.database
+    if args.mongo_url:
+        os.environ["DATA_BASE"] = args.mongo_url
+    else:
+        from benchmarks.standin import bind_standin
+        bind_standin()
+
+    async with app.router.lifespan_context(app):
+        if args.mongo_url:
+            await db.client.drop_database(args.database)
+            await db.ensure_indexes()
+
+        rng = random.Random(args.seed)
+        started = time.perf_counter()
+        data = await seed(args, rng)
+        # The lifespan loaded the roster before the seeding: reload it so scans measure the steady state
+        await rosterService.reload_roster()
+        print(
+            f"Seeded {args.participants} participants, {args.organizers} organizers, {args.tasks} tasks "
+            f"and {args.scans_per_task} scans per task in {time.perf_counter() - started:.1f} s "
+            f"({'mongod' if args.mongo_url else 'mongomock stand-in'}, {args.users} virtual users)"
+        )
+
+        requests = scenario_requests(args, data)
+        budgets = query_budgets(args) if args.check_queries else None
+        violations: Dict[str, str] = {}
+        # A failing request is a 500 sample, not the end of the run
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for name in args.scenarios:
+                # Imports are heavy, a few concurrent uploads are already realistic
+                users = min(args.users, args.import_users) if name == "imports" else args.users
+                started = time.perf_counter()
+                samples = await run_scenario(client, requests[name], users, args.duration, args.seed, budgets, violations)
+                report(name, samples, time.perf_counter() - started)
+
+        if args.mongo_url:
+            await db.client.drop_database(args.database)
+
+    for message in violations.values():
+        print(f"QUERY BUDGET: {message}")
+    return 1 if violations else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-url", help="Run against this MongoDB instead of the in-process stand-in")
+    parser.add_argument("--database", default="Organizers-App-benchmark")
+    parser.add_argument("--users", type=int, default=20, help="Concurrent virtual users per scenario")
+    parser.add_argument("--import-users", type=int, default=2, help="Concurrent virtual users of the imports scenario")
+    parser.add_argument("--duration", type=float, default=10, help="Seconds per scenario")
+    parser.add_argument("--participants", type=int, default=3000)
+    parser.add_argument("--organizers", type=int, default=300)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--scans-per-task", type=int, default=300)
+    parser.add_argument("--import-rows", type=int, default=500)
+    parser.add_argument("--lightweight-scans", action="store_true", help="Scan with ?lightweight=true (needs MongoDB 4.4+, not the stand-in)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--check-queries", action="store_true", help="Fail when a request issues more queries than its route budget")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    raise SystemExit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compares the stock list response path (document -> TaskRead -> jsonable_encoder
+-> JSONResponse) with the DocumentSerializer + FastJSONResponse path.
+
+    python -m benchmarks.serialization [--documents 5000] [--rounds 20]
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from schemas.tasks import TaskRead
+from services import responseService
+from services.responseService import DocumentSerializer, FastJSONResponse
+
+
+def make_documents(count: int) -> list:
+    start = datetime(2024, 1, 1, 8)
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Task {i}",
+            "start_time": start + timedelta(minutes=i),
+            "end_time": start + timedelta(minutes=i + 30),
+            "day": start.replace(hour=0),
+            "location": "Main hall",
+            "description": "Welcome the participants and check their badges",
+            "is_complete": i % 2 == 0,
+            "is_check_in": False,
+        }
+        for i in range(count)
+    ]
+
+
+def stock_path(documents: list) -> bytes:
+    items = []
+    for document in documents:
+        document = dict(document)
+        document["id"] = str(document.pop("_id"))
+        items.append(TaskRead(**document))
+    return JSONResponse(jsonable_encoder(items)).body
+
+
+def fast_path(documents: list, serializer: DocumentSerializer) -> bytes:
+    return FastJSONResponse(serializer.many(documents)).body
+
+
+def measure(func, rounds: int) -> float:
+    func()  # Warm up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+    serializer = DocumentSerializer(TaskRead)
+
+    stock = measure(lambda: stock_path(documents), args.rounds)
+    fast = measure(lambda: fast_path(documents, serializer), args.rounds)
+    encoder = "orjson" if responseService.orjson is not None else "json"
+
+    print(f"{args.documents} documents, {args.rounds} rounds")
+    print(f"stock  (Pydantic + jsonable_encoder): {stock:8.2f} ms")
+    print(f"fast   (DocumentSerializer + {encoder}): {fast:8.2f} ms")
+    print(f"speedup: {stock / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+In-process MongoDB stand-in for the benchmarks, backed by mongomock-motor.
+
+Command monitoring does not exist without a server, so every collection is
+wrapped to count (and time) its operations into the RequestMetrics of the
+request being served, like db.monitoring.DatabaseTimingListener does.
+"""
+import functools
+import inspect
+import time
+from bson import ObjectId
+from bson.errors import InvalidId
+from db import db
+from db.monitoring import current_request
+
+QUERY_METHODS = {
+    "aggregate", "bulk_write", "count_documents", "delete_many", "delete_one", "distinct",
+    "estimated_document_count", "find", "find_one", "find_one_and_delete", "find_one_and_replace",
+    "find_one_and_update", "insert_many", "insert_one", "replace_one", "update_many", "update_one",
+}
+
+
+async def _timed(awaitable, metrics):
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        metrics.db_time += time.perf_counter() - start
+
+
+class CountingCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in QUERY_METHODS:
+            return attribute
+
+        @functools.wraps(attribute)
+        def counted(*args, **kwargs):
+            metrics = current_request.get()
+            if metrics is not None:
+                metrics.db_queries += 1
+                metrics.record_command(f"{name} {self._collection.name}")
+            result = attribute(*args, **kwargs)
+            # find/aggregate return cursors: counted, but their round trips are not timed
+            if metrics is None or not inspect.isawaitable(result):
+                return result
+            return _timed(result, metrics)
+
+        return counted
+
+
+def _support_object_id_convert():
+    """mongomock has no $convert; the organizer schedule pipeline converts task ids to ObjectId with it."""
+    from mongomock.aggregate import _Parser
+
+    handle = _Parser._handle_type_convertion_operator
+
+    def handle_convert(self, operator, values):
+        if operator != "$convert" or values.get("to") != "objectId":
+            return handle(self, operator, values)
+        try:
+            value = self.parse(values["input"])
+        except KeyError:
+            value = None
+        if value is None:
+            return values.get("onNull")
+        try:
+            return ObjectId(value)
+        except (InvalidId, TypeError):
+            return values.get("onError")
+
+    _Parser._handle_type_convertion_operator = handle_convert
+
+
+def _support_bulk_update_sort():
+    """pymongo 4.11+ passes sort= to the bulk builder of UpdateOne/ReplaceOne, mongomock does not accept it."""
+    from mongomock.collection import BulkOperationBuilder
+
+    for name in ("add_update", "add_replace"):
+        add = getattr(BulkOperationBuilder, name)
+        if "sort" in inspect.signature(add).parameters:
+            continue
+
+        def without_sort(self, *args, _add=add, sort=None, **kwargs):
+            return _add(self, *args, **kwargs)
+
+        setattr(BulkOperationBuilder, name, without_sort)
+
+
+def bind_standin():
+    """Binds db to an in-memory client; the lifespan's db.connect() then keeps it."""
+    from mongomock_motor import AsyncMongoMockClient
+
+    _support_object_id_convert()
+    _support_bulk_update_sort()
+    client = AsyncMongoMockClient()
+    db.bind(client, client[db.DATABASE_NAME])
+    for attribute in db.COLLECTIONS:
+        setattr(db, attribute, CountingCollection(getattr(db, attribute)))
@@ -1,20 +1,166 @@
 import os
+import logging
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
 from dotenv import load_dotenv
+from db.monitoring import DatabaseTimingListener, pool_monitor
 
-load_dotenv()
-MONGO_URI = os.getenv("DATA_BASE")
+logger = logging.getLogger(__name__)
 
-client = AsyncIOMotorClient(MONGO_URI)
+DATABASE_NAME = "Organizers-App"
 
-database = client["Organizers-App"]
+# Module attribute -> collection name. The attributes are bound by connect()
+COLLECTIONS = {
+    "your_collection": "TEST",
+    "admin_collection": "admins",
+    "organizer_collection": "organizers",
+    "participant_collection": "participants",
+    "task_collection": "tasks",
+    "event_collection": "events",
+    "assigned_task_collection": "assigned_tasks",
+    "scanned_task_collection": "scanned_tasks",
+    "supervisor_task_collection": "supervisor_tasks",
+    # One document per (task_id, participant_qr) scan, used when SCAN_STORAGE_MODE=document
+    "scan_collection": "scans",
+    # Latest client timestamp per (task_id, participant_qr), orders the offline scans of POST /scanned-tasks/batch
+    "scan_clock_collection": "scan_clocks",
+}
 
-your_collection = database["TEST"]
-admin_collection = database["admins"]
-organizer_collection = database["organizers"]
-participant_collection = database["participants"]
-task_collection = database["tasks"]
-event_collection = database["events"]
-assigned_task_collection = database["assigned_tasks"]
-scanned_task_collection = database["scanned_tasks"]
-supervisor_task_collection = database["supervisor_tasks"]
\ No newline at end of file
+client = None
+database = None
+
+your_collection = None
+admin_collection = None
+organizer_collection = None
+participant_collection = None
+task_collection = None
+event_collection = None
+assigned_task_collection = None
+scanned_task_collection = None
+supervisor_task_collection = None
+scan_collection = None
+scan_clock_collection = None
+
+
+def client_settings() -> dict:
+    """Pool and timeout options of the Motor client, from the environment."""
+    return {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", 100)),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", 0)),
+        "maxIdleTimeMS": int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60000)),
+        "waitQueueTimeoutMS": int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000)),
+        "serverSelectionTimeoutMS": int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+        "connectTimeoutMS": int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000)),
+        "socketTimeoutMS": int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 20000)),
+    }
+
+
+def bind(new_client, new_database):
+    global client, database
+    client = new_client
+    database = new_database
+    for attribute, name in COLLECTIONS.items():
+        globals()[attribute] = new_database[name]
+
+
+async def connect():
+    """
+    Creates the Motor client of this process and checks it can reach MongoDB.
+    Called from the FastAPI lifespan, so every worker gets its own client after fork.
+    """
+    if client is not None:
+        return
+    load_dotenv()
+    new_client = AsyncIOMotorClient(
+        os.getenv("DATA_BASE"),
+        event_listeners=[DatabaseTimingListener(), pool_monitor],
+        **client_settings(),
+    )
+    bind(new_client, new_client[DATABASE_NAME])
+    try:
+        latency = await ping()  # Warm-up: fail fast when MongoDB is unreachable
+    except Exception:
+        close()
+        raise
+    logger.info("Connected to MongoDB", extra={"fields": {"ping_ms": round(latency, 2), **client_settings()}})
+
+
+def close():
+    global client, database
+    if client is not None:
+        client.close()
+    client = None
+    database = None
+    for attribute in COLLECTIONS:
+        globals()[attribute] = None
+
+
+async def ping() -> float:
+    """Round-trip time of a ping command, in milliseconds."""
+    start = time.perf_counter()
+    await database.command("ping")
+    return (time.perf_counter() - start) * 1000
+
+
+
+# Indexes every collection should have, applied on startup by ensure_indexes()
+INDEXES = {
+    "admins": [
+        IndexModel([("email", ASCENDING)], name="email"),
+    ],
+    "organizers": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("is_absent", ASCENDING)], name="is_absent"),
+        IndexModel([("status", ASCENDING)], name="status"),
+    ],
+    "participants": [
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+    ],
+    "tasks": [
+        IndexModel([("is_complete", ASCENDING), ("end_time", ASCENDING)], name="is_complete_end_time"),
+        IndexModel([("day", ASCENDING), ("start_time", ASCENDING)], name="day_start_time"),
+    ],
+    "assigned_tasks": [
+        IndexModel([("task_id", ASCENDING)], name="task_id"),
+        IndexModel([("organizer_id", ASCENDING)], name="organizer_id"),  # Multikey over the id array
+        # Multikey over the id array; _id serves the keyset pagination of /supervisor-tasks/organizer/{id}
+        IndexModel([("supervisor_id", ASCENDING), ("_id", ASCENDING)], name="supervisor_id__id"),
+    ],
+    "scanned_tasks": [
+        IndexModel([("task_id", ASCENDING)], unique=True, name="task_id_unique"),
+    ],
+    "scans": [
+        IndexModel([("task_id", ASCENDING), ("participant_qr", ASCENDING)], unique=True, name="task_id_participant_qr_unique"),
+    ],
+    "scan_clocks": [
+        IndexModel([("task_id", ASCENDING), ("participant_qr", ASCENDING)], unique=True, name="task_id_participant_qr_unique"),
+    ],
+}
+
+
+async def ensure_indexes(collections=None):
+    """Creates the missing indexes of the registry. A failing collection is logged and skipped."""
+    for name, indexes in INDEXES.items():
+        if collections is not None and name not in collections:
+            continue
+        try:
+            await database[name].create_indexes(indexes)
+        except OperationFailure as e:
+            logger.error("Could not create indexes on %s: %s", name, e)
+
+
+async def index_report() -> dict:
+    """Compares the indexes that exist in MongoDB with the registry."""
+    report = {}
+    for name, indexes in INDEXES.items():
+        existing = set((await database[name].index_information()).keys())
+        existing.discard("_id_")
+        expected = {index.document["name"] for index in indexes}
+        report[name] = {
+            "present": sorted(expected & existing),
+            "missing": sorted(expected - existing),
+            "unmanaged": sorted(existing - expected),
+        }
+    return report
@@ -0,0 +1,71 @@
+"""
+Copies the legacy scanned_tasks documents (one participant_qr array per task)
+into the scans collection (one document per task_id/participant_qr).
+
+Usage:
+    python -m db.migrate_scans [--chunk-size 1000] [--delete-source]
+
+Run it before switching SCAN_STORAGE_MODE to "document". It can be re-run safely:
+scans that were already copied are skipped by the unique index. Any other write
+error stops the migration before the source document is deleted.
+"""
+import argparse
+import asyncio
+from datetime import datetime
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+from db import db
+
+
+async def migrate_scans(chunk_size: int = 1000, delete_source: bool = False) -> dict:
+    await db.connect()
+    # Re-runs rely on the unique index to skip copied scans: never migrate without it
+    await db.scan_collection.create_indexes(db.INDEXES["scans"])
+
+    stats = {"tasks": 0, "inserted": 0, "already_present": 0}
+    migrated_at = datetime.utcnow()
+
+    async for task in db.scanned_task_collection.find({}, {"task_id": 1, "participant_qr": 1}):
+        stats["tasks"] += 1
+        participant_qrs = list(dict.fromkeys(task.get("participant_qr", [])))
+
+        for start in range(0, len(participant_qrs), chunk_size):
+            requests = [
+                InsertOne({"task_id": task["task_id"], "participant_qr": qr, "scanned_at": migrated_at})
+                for qr in participant_qrs[start:start + chunk_size]
+            ]
+            try:
+                result = await db.scan_collection.bulk_write(requests, ordered=False)
+                stats["inserted"] += result.inserted_count
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                stats["inserted"] += e.details.get("nInserted", 0)
+                stats["already_present"] += sum(1 for error in errors if error.get("code") == 11000)
+                failed = [error for error in errors if error.get("code") != 11000]
+                if failed:
+                    raise RuntimeError(
+                        f"Could not copy {len(failed)} scans of task {task['task_id']}, "
+                        f"its scanned_tasks document is kept: {failed[0].get('errmsg')}"
+                    ) from e
+
+        if delete_source:
+            await db.scanned_task_collection.delete_one({"_id": task["_id"]})
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate scanned_tasks arrays to one scans document per scan")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Scans written per bulk_write")
+    parser.add_argument("--delete-source", action="store_true", help="Delete each scanned_tasks document once copied")
+    args = parser.parse_args()
+
+    try:
+        stats = asyncio.run(migrate_scans(args.chunk_size, args.delete_source))
+    finally:
+        db.close()
+    print(f"Migrated {stats['tasks']} tasks: {stats['inserted']} scans inserted, {stats['already_present']} already present")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+from pymongo import monitoring
+
+
+class RequestMetrics:
+    """Timings of the request being served, filled in by the middleware, the routes and the command listener."""
+
+    __slots__ = ("db_time", "db_queries", "db_commands", "handler_time", "route_time")
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.db_queries = 0
+        # "find participants" -> count, shows which query runs in a loop
+        self.db_commands: Dict[str, int] = {}
+        self.handler_time = 0.0
+        self.route_time = 0.0
+
+    def record_command(self, key: str):
+        self.db_commands[key] = self.db_commands.get(key, 0) + 1
+
+    def repeated_commands(self, threshold: int = 2) -> Dict[str, int]:
+        return {key: count for key, count in self.db_commands.items() if count >= threshold}
+
+
+# Motor runs pymongo on a thread pool with a copy of the caller's context,
+# so the listener sees the RequestMetrics of the request that issued the command.
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+
+def command_key(event) -> str:
+    """Command name and collection, e.g. "find participants"."""
+    target = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+    return f"{event.command_name} {target}" if isinstance(target, str) else event.command_name
+
+
+class DatabaseTimingListener(monitoring.CommandListener):
+    """Adds every MongoDB command and its duration to the active request."""
+
+    def started(self, event):
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.record_command(command_key(event))
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.db_queries += 1
+            metrics.db_time += event.duration_micros / 1_000_000
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """
+    Connection pool counters for /health and /metrics. Plain integer updates
+    without a lock: the values are for monitoring, not for decisions.
+    """
+
+    def __init__(self):
+        self.open_connections = 0
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.open_connections += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.open_connections -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        self.checked_out += 1
+        self.checkouts += 1
+        wait = getattr(event, "duration", None)  # Reported by pymongo >= 4.7
+        if wait is not None:
+            self.checkout_wait_total += wait
+            self.checkout_wait_max = max(self.checkout_wait_max, wait)
+
+    def connection_checked_in(self, event):
+        self.checked_out -= 1
+
+    def stats(self) -> dict:
+        return {
+            "open_connections": self.open_connections,
+            "checked_out": self.checked_out,
+            "checkouts": self.checkouts,
+            "checkout_failures": self.checkout_failures,
+            "checkout_wait_avg_ms": round(self.checkout_wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+        }
+
+
+pool_monitor = PoolMonitor()
+
+
+@contextmanager
+def track_queries():
+    """Collects the commands issued inside the block, for code that runs outside a request."""
+    metrics = RequestMetrics()
+    token = current_request.set(metrics)
+    try:
+        yield metrics
+    finally:
+        current_request.reset(token)
+
+
+def assert_max_queries(measured, max_queries: int, label: str = ""):
+    """
+    Fails when a response (its X-DB-Queries header) or a RequestMetrics went
+    over max_queries, so suites can lock in the query count of an endpoint.
+    """
+    if isinstance(measured, RequestMetrics):
+        count, commands = measured.db_queries, measured.db_commands
+    else:
+        header = measured.headers.get("x-db-queries")
+        if header is None:
+            raise AssertionError(f"{label or 'response'} has no X-DB-Queries header")
+        count, commands = int(header), None
+    if count > max_queries:
+        details = f": {commands}" if commands else ""
+        raise AssertionError(f"{label or 'block'} issued {count} queries, budget is {max_queries}{details}")
@@ -1,8 +1,16 @@
+from dotenv import load_dotenv
+
+# Loaded once, before the services read their settings from the environment at import time
+load_dotenv()
+
+import importlib.util
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from api.endpoints.admin import router as admin_router
 from api.endpoints.assignedtask import router as assigned_task_router
 from api.endpoints.event import router as event_router
+from api.endpoints.live import router as live_router
 from api.endpoints.organizers import router as organizer_router
 from api.endpoints.participants import router as participant_router
 from api.endpoints.scannedtask import router as scanned_task_router
@@ -10,10 +18,39 @@ from api.endpoints.supervisortask import router as supervisor_task_router
 from api.endpoints.tasks import router as task_router
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, PlainTextResponse
+from db import db
+from db.monitoring import pool_monitor
+from services import liveService, metricsService, passwordService, qrService, rosterService
+from services.loggingService import configure_logging, get_logger, shutdown_logging
+from services.timingService import RequestTimingMiddleware
+from services.workerService import WEB_CONCURRENCY
 
-app = FastAPI()
-load_dotenv()
+configure_logging()
+logger = get_logger(__name__)
+
+CREATE_INDEXES_ON_STARTUP = os.getenv("CREATE_INDEXES_ON_STARTUP", "true").lower() == "true"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    await db.connect()
+    if CREATE_INDEXES_ON_STARTUP:
+        await db.ensure_indexes()
+    await rosterService.reload_roster()  # Scans are validated against it from the first request
+    rosterService.start_refresh()
+    liveService.start_change_streams()
+    yield
+    await liveService.stop_change_streams()
+    await rosterService.stop_refresh()
+    db.close()
+    passwordService.shutdown_executor()
+    qrService.shutdown_executor()
+    shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
 FRONT_URL = os.getenv("FRONTEND_URL")
 
@@ -24,8 +61,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all HTTP methods (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["X-Next-Cursor"],  # Keyset pagination cursor, readable by browser clients
 )
 
+# Per-request handler / database / serialization timings
+app.add_middleware(RequestTimingMiddleware)
+
 port = int(os.environ.get("PORT", 8000))  # Use 8000 as a fallback
 
 
@@ -33,16 +74,62 @@ port = int(os.environ.get("PORT", 8000))  # Use 8000 as a fallback
 async def root():
     return {"message": "Welcome to the Organizer App API!"}
 
+
+@app.get("/health")
+async def health():
+    settings = db.client_settings()
+    pool = pool_monitor.stats()
+    pool["max_pool_size"] = settings["maxPoolSize"]
+    pool["min_pool_size"] = settings["minPoolSize"]
+    pool["utilization"] = round(pool["checked_out"] / settings["maxPoolSize"], 4) if settings["maxPoolSize"] else 0.0
+
+    try:
+        latency = await db.ping()
+    except Exception as e:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "error": str(e), "pool": pool})
+    return {"status": "ok", "mongo_ping_ms": round(latency, 2), "pool": pool}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Prometheus text format; each worker answers with its own series (worker label)
+    return PlainTextResponse(metricsService.render(), media_type="text/plain; version=0.0.4")
+
 # Include all routers
 app.include_router(admin_router, prefix="/admins", tags=["Admins"])
 app.include_router(assigned_task_router, prefix="/assigned-tasks", tags=["Assigned Tasks"])
 app.include_router(event_router, prefix="/events", tags=["Events"])
+app.include_router(live_router, prefix="/live", tags=["Live Updates"])
 app.include_router(organizer_router, prefix="/organizers", tags=["Organizers"])
 app.include_router(participant_router, prefix="/participants", tags=["Participants"])
 app.include_router(scanned_task_router, prefix="/scanned-tasks", tags=["Scanned Tasks"])
 app.include_router(supervisor_task_router, prefix="/supervisor-tasks", tags=["Supervisor Tasks"])
 app.include_router(task_router, prefix="/tasks", tags=["Tasks"])
 
+
+def available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=port)
+
+    if WEB_CONCURRENCY > 1 and liveService.LIVE_UPDATES_SOURCE == "local":
+        # Each worker only publishes its own writes: clients of the other workers miss them
+        logger.warning(
+            "WEB_CONCURRENCY=%d with LIVE_UPDATES_SOURCE=local: live updates only reach the clients "
+            "of the worker that handled the write, use LIVE_UPDATES_SOURCE=change_streams",
+            WEB_CONCURRENCY,
+        )
+
+    # Production entry point: one process per worker, each with its own Motor
+    # client and in-process caches (created in the lifespan hook, after the worker starts)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=port,
+        workers=WEB_CONCURRENCY,
+        loop="uvloop" if available("uvloop") else "asyncio",
+        http="httptools" if available("httptools") else "h11",
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", 30)),
+    )
@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReportBase(BaseModel):
+    inserted_count: int
+    skipped_count: int
+    error_count: int
+    errors: List[ImportRowError] = []
@@ -16,4 +16,4 @@ class EventUpdate(BaseModel):
     days: Optional[List[datetime]] = None
 
 class EventRead(EventBase):
-    pass
+    id: str
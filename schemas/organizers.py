@@ -1,5 +1,6 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel
+from schemas.csvimport import ImportReportBase
 
 
 
@@ -35,3 +36,6 @@ class OrganizerLoginRequest(BaseModel):
 class OrganizerLoginResponse(OrganizerBase):
     id: str
     # This inherits all fields from OrganizerBase
+
+class OrganizerImportReport(ImportReportBase):
+    inserted: List[OrganizerRead]
@@ -1,5 +1,6 @@
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, EmailStr
+from schemas.csvimport import ImportReportBase
 
 class ParticipantBase(BaseModel):
     full_name: str
@@ -18,3 +19,6 @@ class ParticipantUpdate(BaseModel):
    
 class ParticipantRead(ParticipantBase):
     id: str
+
+class ParticipantImportReport(ImportReportBase):
+    inserted: List[ParticipantRead]
@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from datetime import datetime
 from typing import List, Optional
 
 class ScannedTaskBase(BaseModel):
@@ -13,4 +14,34 @@ class ScannedTaskRead(ScannedTaskBase):
 class ScannedTaskUpdate(BaseModel):
     task_id: str
     participant_qr: str
-    scanned: bool
\ No newline at end of file
+    scanned: bool
+
+class ScannedTaskStatus(BaseModel):
+    task_id: str
+    participant_qr: str
+    scanned: bool
+    scanned_count: int
+
+class ScanRecord(BaseModel):
+    task_id: str
+    participant_qr: str
+    scanned: bool = True
+    client_timestamp: datetime  # When the device scanned, the newest record of a participant wins
+    idempotency_key: Optional[str] = None  # Set by the device, replaying the last applied record reports it as duplicate
+
+class ScanBatch(BaseModel):
+    records: List[ScanRecord]
+
+class ScanRecordResult(BaseModel):
+    index: int
+    task_id: str
+    participant_qr: str
+    status: str  # applied, stale, duplicate or error
+    error: Optional[str] = None
+
+class ScanBatchReport(BaseModel):
+    applied_count: int
+    stale_count: int
+    duplicate_count: int
+    error_count: int
+    results: List[ScanRecordResult]
@@ -1,8 +1,8 @@
 from pydantic import BaseModel
 
 class SupervisorTaskBase(BaseModel):
-    task_id: int
-    supervisor_id: int
+    task_id: str
+    supervisor_id: str
 
 class SupervisorTaskCreate(SupervisorTaskBase):
     pass
@@ -1,6 +1,7 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
+from schemas.csvimport import ImportReportBase
 
 class TaskBase(BaseModel):
     name: str
@@ -27,3 +28,6 @@ class TaskUpdate(BaseModel):
 
 class TaskRead(TaskBase):
     id: str
+
+class TaskImportReport(ImportReportBase):
+    inserted: List[TaskRead]
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+# Every cache lives in the memory of one uvicorn worker process: caches are
+# per worker, never shared between workers.
+caches: Dict[str, "AsyncCache"] = {}
+
+
+def _retrieve_exception(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+
+class AsyncCache:
+    """
+    In-process cache with an optional TTL and an optional LRU size bound.
+    Concurrent misses on the same key are coalesced: the first caller computes
+    the value and the others await the same result.
+    """
+
+    def __init__(self, name: str, ttl: Optional[float] = None, maxsize: Optional[int] = None):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+        caches[name] = self
+
+    def _expires_at(self) -> Optional[float]:
+        return time.monotonic() + self.ttl if self.ttl is not None else None
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        self._entries.move_to_end(key)
+        return value
+
+    def get_many(self, keys) -> tuple:
+        """Returns ({key: value} for cached keys, [keys not cached]) and counts hits and misses."""
+        missing = object()
+        found, not_found = {}, []
+        for key in keys:
+            value = self.get(key, missing)
+            if value is missing:
+                not_found.append(key)
+            else:
+                found[key] = value
+        self.hits += len(found)
+        self.misses += len(not_found)
+        return found, not_found
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (value, self._expires_at())
+        self._entries.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        # A computation already in flight may have read stale data, it must not be stored
+        self._entries.pop(key, None)
+        self._pending.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+        self._pending.clear()
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            self.hits += 1
+            return value
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Someone is already computing this key, share their result
+            self.hits += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        # The computation runs in its own task: cancelling the caller that started it
+        # must not fail the callers sharing its result
+        task = asyncio.create_task(self._compute(key, compute))
+        task.add_done_callback(_retrieve_exception)  # Nobody may be left to await it
+        self._pending[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        task = asyncio.current_task()
+        try:
+            value = await compute()
+            if self._pending.get(key) is task:
+                self.set(key, value)
+            return value
+        finally:
+            if self._pending.get(key) is task:
+                del self._pending[key]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,134 @@
+import csv
+import codecs
+import os
+from typing import Awaitable, Callable, Iterable, Iterator, List, Optional, Tuple
+from fastapi import HTTPException, UploadFile
+from pymongo.errors import BulkWriteError
+from services import metricsService
+
+DEFAULT_CHUNK_SIZE = int(os.getenv("CSV_IMPORT_CHUNK_SIZE", 500))
+
+
+class ImportReport:
+    """Collects what happened to every row of an import."""
+
+    def __init__(self):
+        self.inserted: List[dict] = []
+        self.skipped: int = 0
+        self.errors: List[dict] = []
+
+    def add_error(self, row_number: int, error: str):
+        self.errors.append({"row": row_number, "error": error})
+
+    @property
+    def processed(self) -> int:
+        return len(self.inserted) + self.skipped + len(self.errors)
+
+    def to_dict(self, inserted: List) -> dict:
+        return {
+            "inserted_count": len(self.inserted),
+            "skipped_count": self.skipped,
+            "error_count": len(self.errors),
+            "inserted": inserted,
+            "errors": self.errors,
+        }
+
+
+def iter_csv_rows(file: UploadFile, required_columns: Iterable[str] = ()) -> Iterator[Tuple[int, dict]]:
+    """Yields (row_number, row) lazily from the uploaded file without loading it in memory."""
+    file.file.seek(0)
+    reader = csv.DictReader(codecs.iterdecode(file.file, "utf-8-sig"))
+
+    missing = [column for column in required_columns if column not in (reader.fieldnames or [])]
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"CSV file is missing required column: {', '.join(missing)}"
+        )
+
+    # Row 1 is the header
+    for row_number, row in enumerate(reader, start=2):
+        yield row_number, row
+
+
+def chunked(items: List, chunk_size: int) -> Iterator[List]:
+    for start in range(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
+
+
+async def find_existing_values(collection, field: str, values: Iterable[str]) -> set:
+    """Returns the subset of `values` already stored in `field`, with a single $in query."""
+    values = list(set(values))
+    if not values:
+        return set()
+    cursor = collection.find({field: {"$in": values}}, {field: 1, "_id": 0})
+    return {document[field] async for document in cursor}
+
+
+async def insert_in_chunks(collection, rows: List[Tuple[int, dict]], report: ImportReport, chunk_size: int):
+    """Unordered insert_many per chunk; failed documents are reported against their CSV row."""
+    for chunk in chunked(rows, chunk_size):
+        documents = [document for _, document in chunk]
+        failed = set()
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for write_error in e.details.get("writeErrors", []):
+                failed.add(write_error["index"])
+                report.add_error(chunk[write_error["index"]][0], write_error.get("errmsg", "Write error"))
+
+        for index, (_, document) in enumerate(chunk):
+            if index not in failed:
+                report.inserted.append(document)
+
+
+async def import_csv(
+    file: UploadFile,
+    collection,
+    parse_row: Callable[[dict], dict],
+    required_columns: Iterable[str] = (),
+    unique_field: Optional[str] = None,
+    prepare_documents: Optional[Callable[[List[dict]], Awaitable[None]]] = None,
+    chunk_size: Optional[int] = None,
+) -> ImportReport:
+    """
+    Shared CSV import pipeline:
+    stream the rows, parse them, drop duplicates with one $in query,
+    then insert the remaining documents with unordered insert_many in chunks.
+    """
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    report = ImportReport()
+    rows = []
+    # Progress shown by GET /metrics while the import runs
+    job = metricsService.start_import(collection.name)
+
+    try:
+        for row_number, row in iter_csv_rows(file, required_columns):
+            job.rows_read += 1
+            try:
+                rows.append((row_number, parse_row(row)))
+            except (KeyError, ValueError) as e:
+                report.add_error(row_number, f"Invalid row: {str(e)}")
+
+        if unique_field:
+            existing = await find_existing_values(collection, unique_field, (document[unique_field] for _, document in rows))
+            unique_rows = []
+            seen = set(existing)
+            for row_number, document in rows:
+                if document[unique_field] in seen:
+                    report.skipped += 1  # Skip duplicates already stored or repeated in the file
+                    continue
+                seen.add(document[unique_field])
+                unique_rows.append((row_number, document))
+            rows = unique_rows
+        job.rows_done = report.processed
+
+        for chunk in chunked(rows, chunk_size):
+            if prepare_documents:
+                await prepare_documents([document for _, document in chunk])
+            await insert_in_chunks(collection, chunk, report, chunk_size)
+            job.rows_done = report.processed
+    finally:
+        metricsService.finish_import(job, len(report.inserted), report.skipped, len(report.errors))
+
+    return report
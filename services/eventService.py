@@ -0,0 +1,36 @@
+import os
+from typing import Dict, List
+from db import db
+from schemas.event import EventRead
+from services.cacheService import AsyncCache
+from services.responseService import EncodedJSON, serializer_for
+
+# The event calendar is read by every client at startup and almost never changes.
+# Writes invalidate the cache of their own worker; the TTL bounds how long the
+# other workers may keep serving the previous version.
+EVENT_CACHE_TTL = float(os.getenv("EVENT_CACHE_TTL", 300))
+
+event_cache = AsyncCache("events", ttl=EVENT_CACHE_TTL)
+event_serializer = serializer_for(EventRead)
+
+
+class EventCalendar:
+    """Every event, encoded once for the list endpoint and once per event."""
+
+    def __init__(self, events: List[dict]):
+        self.events = events
+        self.all = EncodedJSON(events)
+        self.by_id: Dict[str, EncodedJSON] = {event["id"]: EncodedJSON(event) for event in events}
+
+
+async def compute_event_calendar() -> EventCalendar:
+    cursor = db.event_collection.find({}, event_serializer.projection).sort("_id", 1)
+    return EventCalendar([event_serializer.to_dict(event) async for event in cursor])
+
+
+async def get_event_calendar() -> EventCalendar:
+    return await event_cache.get_or_compute("calendar", compute_event_calendar)
+
+
+def invalidate_events():
+    event_cache.invalidate("calendar")
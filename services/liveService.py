@@ -0,0 +1,232 @@
+import asyncio
+import os
+from typing import Dict, Iterable, List, Optional, Set
+from pymongo.errors import PyMongoError
+from db import db
+from services import rosterService
+from services.loggingService import get_logger
+
+# "local": handlers publish their own writes to the subscribers of this worker.
+# "change_streams": MongoDB change streams feed every worker (needs a replica set).
+LIVE_UPDATES_SOURCE = os.getenv("LIVE_UPDATES_SOURCE", "local")
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", 256))
+
+logger = get_logger(__name__)
+
+
+class Subscription:
+    def __init__(self, channels: Iterable[str]):
+        self.channels = set(channels)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client: drop what it has not read yet and ask it to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+
+class Broker:
+    """In-process pub/sub between the write paths and the connected clients."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, channels: Iterable[str]) -> Subscription:
+        subscription = Subscription(channels)
+        for channel in subscription.channels:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        for channel in subscription.channels:
+            subscribers = self._subscribers.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[channel]
+
+    def publish(self, channels: Iterable[str], event: dict):
+        delivered = set()
+        for channel in channels:
+            for subscription in self._subscribers.get(channel, ()):
+                if subscription not in delivered:
+                    delivered.add(subscription)
+                    subscription.push(event)
+
+    def subscriber_count(self) -> int:
+        return len({subscription for subscribers in self._subscribers.values() for subscription in subscribers})
+
+
+broker = Broker()
+
+
+def task_channels(task_id: str) -> List[str]:
+    return [f"task:{task_id}", "tasks"]
+
+
+def organizer_channels(department: Optional[str]) -> List[str]:
+    return [f"department:{department}", "organizers"] if department else ["organizers"]
+
+
+def _notify(channels: List[str], event: dict):
+    # With change streams the database is the single source of events
+    if LIVE_UPDATES_SOURCE == "local":
+        broker.publish(channels, event)
+
+
+def notify_scan(task_id: str, participant_qr: str, scanned: bool):
+    _notify(task_channels(task_id), {"type": "scan", "task_id": task_id, "participant_qr": participant_qr, "scanned": scanned})
+
+
+def notify_task(task_id: str, changes: dict):
+    _notify(task_channels(task_id), {"type": "task", "id": task_id, **changes})
+
+
+def _organizer_change_channels(department: Optional[str], previous_department: Optional[str]) -> List[str]:
+    # An organizer moving to another department leaves the channel of the previous one
+    channels = organizer_channels(department)
+    if previous_department != department:
+        channels += [channel for channel in organizer_channels(previous_department) if channel not in channels]
+    return channels
+
+
+def notify_organizer(organizer_id: str, department: Optional[str], previous_department: Optional[str], changes: dict):
+    _notify(_organizer_change_channels(department, previous_department), {"type": "organizer", "id": organizer_id, **changes})
+
+
+ORGANIZER_LIVE_FIELDS = ("status", "is_absent", "department", "full_name")
+
+
+def _changed_fields(change: dict) -> dict:
+    description = change.get("updateDescription") or {}
+    return description.get("updatedFields") or {}
+
+
+def _publish_change(collection_name: str, change: dict):
+    operation = change["operationType"]
+    document = change.get("fullDocument") or {}
+    document_id = str(change["documentKey"]["_id"])
+
+    if collection_name == "tasks":
+        changes = _changed_fields(change) if operation == "update" else {"operation": operation}
+        broker.publish(task_channels(document_id), {"type": "task", "id": document_id, **changes})
+
+    elif collection_name == "organizers":
+        changes = {k: v for k, v in _changed_fields(change).items() if k in ORGANIZER_LIVE_FIELDS}
+        if operation == "update" and not changes:
+            return  # Password or contact changes are not pushed
+        if operation != "update":
+            changes = {"operation": operation}
+        previous = change.get("fullDocumentBeforeChange") or document
+        channels = _organizer_change_channels(document.get("department") or previous.get("department"), previous.get("department"))
+        broker.publish(channels, {"type": "organizer", "id": document_id, **changes})
+
+    elif collection_name == "participants":
+        rosterService.apply_change(operation, document_id, document)
+
+    elif collection_name == "scans" and operation == "insert":
+        broker.publish(task_channels(document["task_id"]), {
+            "type": "scan", "task_id": document["task_id"], "participant_qr": document["participant_qr"], "scanned": True,
+        })
+
+    elif collection_name == "scans" and operation == "delete":
+        # Un-scans in document mode: the pair only exists in the pre-image
+        scan = change.get("fullDocumentBeforeChange")
+        if scan:
+            broker.publish(task_channels(scan["task_id"]), {
+                "type": "scan", "task_id": scan["task_id"], "participant_qr": scan["participant_qr"], "scanned": False,
+            })
+        else:
+            broker.publish(["tasks"], {"type": "scan", "resync": True})
+
+    elif collection_name == "scanned_tasks" and document:
+        # Projected by the stream: added holds the values appended by $addToSet (participant_qr.N),
+        # rewritten is set when $pull replaced the whole array
+        event = {"type": "scan", "task_id": document["task_id"], "scanned_count": change.get("scanned_count", 0)}
+        if change.get("added"):
+            event["added"] = change["added"]
+        elif change.get("rewritten") or operation != "update":
+            event["resync"] = True
+        broker.publish(task_channels(document["task_id"]), event)
+
+
+# Projections applied by MongoDB before the events leave the server
+STREAM_PROJECTIONS = {
+    # Never ship the participant_qr array: only the task id, the count and the appended values
+    "scanned_tasks": {
+        "operationType": 1,
+        "documentKey": 1,
+        "fullDocument.task_id": 1,
+        "scanned_count": {"$size": {"$ifNull": ["$fullDocument.participant_qr", []]}},
+        "added": {"$map": {
+            "input": {"$filter": {
+                "input": {"$objectToArray": {"$ifNull": ["$updateDescription.updatedFields", {}]}},
+                "cond": {"$eq": [{"$indexOfCP": ["$$this.k", "participant_qr."]}, 0]},
+            }},
+            "in": "$$this.v",
+        }},
+        "rewritten": {"$eq": [{"$type": "$updateDescription.updatedFields.participant_qr"}, "array"]},
+    },
+    "organizers": {
+        "fullDocument.password": 0,
+        "fullDocumentBeforeChange.password": 0,
+        "updateDescription.updatedFields.password": 0,
+    },
+}
+# Deleted scans and department moves are only known from the document before the change
+PRE_IMAGE_COLLECTIONS = ("scans", "organizers")
+
+
+async def _enable_pre_images(collection):
+    try:
+        await db.database.command({"collMod": collection.name, "changeStreamPreAndPostImages": {"enabled": True}})
+    except PyMongoError as e:
+        logger.warning("Pre-images unavailable on %s (MongoDB 6.0+ required): %s", collection.name, e)
+
+
+async def _watch(collection):
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+    if collection.name in STREAM_PROJECTIONS:
+        pipeline.append({"$project": STREAM_PROJECTIONS[collection.name]})
+    options = {"full_document": "updateLookup"}
+    if collection.name in PRE_IMAGE_COLLECTIONS:
+        await _enable_pre_images(collection)
+        options["full_document_before_change"] = "whenAvailable"
+
+    while True:
+        try:
+            async with collection.watch(pipeline, **options) as stream:
+                async for change in stream:
+                    try:
+                        _publish_change(collection.name, change)
+                    except Exception:
+                        # One unexpected event must not stop the watcher
+                        logger.exception("Could not publish a change of %s", collection.name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Change stream on %s failed, retrying: %s", collection.name, e)
+            await asyncio.sleep(5)
+
+
+_watchers: List[asyncio.Task] = []
+
+
+def start_change_streams():
+    """Starts one change stream watcher per collection when LIVE_UPDATES_SOURCE=change_streams."""
+    if LIVE_UPDATES_SOURCE != "change_streams" or _watchers:
+        return
+    collections = [db.task_collection, db.organizer_collection, db.participant_collection, db.scanned_task_collection, db.scan_collection]
+    for collection in collections:
+        _watchers.append(asyncio.create_task(_watch(collection)))
+
+
+async def stop_change_streams():
+    for watcher in _watchers:
+        watcher.cancel()
+    await asyncio.gather(*_watchers, return_exceptions=True)
+    _watchers.clear()
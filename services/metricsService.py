@@ -0,0 +1,220 @@
+import os
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+from db.monitoring import pool_monitor
+from services import cacheService, passwordService
+
+# Metrics in the Prometheus text format, served by GET /metrics.
+# Every update below happens on the event loop thread of the worker, so the
+# counters are plain dict/list increments without locks. Each worker keeps its
+# own values: the worker label (its pid) keeps the series of the workers apart.
+WORKER = str(os.getpid())
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+registry: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.append(f'worker="{WORKER}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value) -> str:
+    if isinstance(value, float):
+        return "+Inf" if value == float("inf") else repr(value)
+    return str(value)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.values: Dict[tuple, float] = {}
+        registry.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def lines(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in self.values.items()]
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket (not cumulative)..., +Inf count, sum]
+        self.series: Dict[tuple, list] = {}
+        registry.append(self)
+
+    def observe(self, *label_values, value: float):
+        series = self.series.get(label_values)
+        if series is None:
+            series = self.series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def lines(self) -> List[str]:
+        lines = []
+        for key, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (_number(float(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {_number(series[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+class Gauges:
+    """Values read from their owner at scrape time, nothing to update on the hot path."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], collect: Callable[[], Iterable[Tuple[tuple, float]]], type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect
+        self.type = type
+        registry.append(self)
+
+    def lines(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labels, key)} {_number(value)}" for key, value in self.collect()]
+
+
+# HTTP
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+
+
+def observe_request(method: str, route: str, status: int, elapsed: float, event_stream: bool = False):
+    http_requests.inc(method, route, status)
+    if not event_stream:  # An event stream lasts the whole session, its duration is not latency
+        http_latency.observe(method, route, value=elapsed)
+
+
+# Scans
+
+# No task_id label: it comes from request bodies, every unknown id would add a series for good
+scans = Counter("scans_total", "Scan status changes", ("scanned",))
+
+
+scan_batch_records = Counter("scan_batch_records_total", "Records of POST /scanned-tasks/batch by result", ("status",))
+
+
+def record_scans(scanned: bool, count: int = 1):
+    scans.inc("true" if scanned else "false", amount=count)
+
+
+def record_scan_batch(statuses: Iterable[str]):
+    for status in statuses:
+        scan_batch_records.inc(status)
+
+
+# CSV imports
+
+class ImportJob:
+    __slots__ = ("collection", "rows_read", "rows_done")
+
+    def __init__(self, collection: str):
+        self.collection = collection
+        self.rows_read = 0
+        self.rows_done = 0
+
+
+import_jobs: Set[ImportJob] = set()
+import_rows = Counter("csv_import_rows_total", "Rows of finished CSV imports by result", ("collection", "result"))
+
+
+def start_import(collection: str) -> ImportJob:
+    job = ImportJob(collection)
+    import_jobs.add(job)
+    return job
+
+
+def finish_import(job: ImportJob, inserted: int, skipped: int, errors: int):
+    import_jobs.discard(job)
+    import_rows.inc(job.collection, "inserted", amount=inserted)
+    import_rows.inc(job.collection, "skipped", amount=skipped)
+    import_rows.inc(job.collection, "error", amount=errors)
+
+
+def _running_imports(field: str):
+    totals: Dict[tuple, int] = {}
+    for job in import_jobs:
+        totals[(job.collection,)] = totals.get((job.collection,), 0) + getattr(job, field)
+    return totals.items()
+
+
+def _running_import_count():
+    totals: Dict[tuple, int] = {}
+    for job in import_jobs:
+        totals[(job.collection,)] = totals.get((job.collection,), 0) + 1
+    return totals.items()
+
+
+Gauges("csv_imports_in_progress", "Running CSV imports", ("collection",), _running_import_count)
+Gauges("csv_import_rows_read", "Rows read by the running CSV imports", ("collection",), lambda: _running_imports("rows_read"))
+Gauges("csv_import_rows_done", "Rows inserted, skipped or failed by the running CSV imports", ("collection",), lambda: _running_imports("rows_done"))
+
+
+# MongoDB connection pool
+
+def _pool(*fields):
+    return lambda: [((), getattr(pool_monitor, field)) for field in fields]
+
+
+Gauges("mongo_pool_open_connections", "Open connections of the Motor pool", (), _pool("open_connections"))
+Gauges("mongo_pool_checked_out", "Connections in use", (), _pool("checked_out"))
+Gauges("mongo_pool_checkouts_total", "Connection checkouts", (), _pool("checkouts"), type="counter")
+Gauges("mongo_pool_checkout_failures_total", "Failed connection checkouts", (), _pool("checkout_failures"), type="counter")
+Gauges("mongo_pool_checkout_wait_seconds_total", "Time spent waiting for a connection", (), _pool("checkout_wait_total"), type="counter")
+Gauges("mongo_pool_checkout_wait_max_seconds", "Longest wait for a connection", (), _pool("checkout_wait_max"))
+
+
+# Password hashing pool
+
+def _password(field: str):
+    return lambda: [((), passwordService.get_pool_stats()[field])]
+
+
+Gauges("password_pool_size", "Threads of the bcrypt pool", (), _password("pool_size"))
+Gauges("password_pool_running", "bcrypt jobs running", (), _password("running"))
+Gauges("password_pool_queue_depth", "bcrypt jobs waiting for a thread", (), _password("queue_depth"))
+Gauges("password_pool_completed_total", "bcrypt jobs completed", (), _password("completed"), type="counter")
+
+
+# In-process caches
+
+def _caches(field: str):
+    return lambda: [((name,), cache.stats()[field]) for name, cache in cacheService.caches.items()]
+
+
+Gauges("cache_hits_total", "Cache hits", ("cache",), _caches("hits"), type="counter")
+Gauges("cache_misses_total", "Cache misses", ("cache",), _caches("misses"), type="counter")
+Gauges("cache_hit_ratio", "Cache hits / lookups", ("cache",), _caches("hit_ratio"))
+Gauges("cache_size", "Cached entries", ("cache",), _caches("size"))
+
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        lines.extend(metric.lines())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,55 @@
+import os
+from typing import Dict, Iterable
+from bson import ObjectId
+from db import db
+from services.cacheService import AsyncCache
+from services.searchService import organizer_index
+from services.tasksService import stats_cache
+
+NAME_CACHE_SIZE = int(os.getenv("NAME_CACHE_SIZE", 2048))
+NAME_CACHE_TTL = float(os.getenv("NAME_CACHE_TTL", 60))
+
+# organizer id -> full_name, invalidated when this worker updates or deletes an organizer;
+# the TTL bounds how long the other workers show the previous name
+name_cache = AsyncCache("organizer_names", ttl=NAME_CACHE_TTL, maxsize=NAME_CACHE_SIZE)
+
+
+async def compute_organizer_statistics() -> dict:
+    pipeline = [
+        {"$group": {
+            "_id": None,
+            "total_organizers": {"$sum": 1},
+            "present_organizers": {"$sum": {"$cond": [{"$eq": ["$is_absent", False]}, 1, 0]}},
+            "absent_organizers": {"$sum": {"$cond": [{"$eq": ["$is_absent", True]}, 1, 0]}},
+            "free_organizers": {"$sum": {"$cond": [{"$eq": ["$status", "free"]}, 1, 0]}},
+        }},
+        {"$project": {"_id": 0}},
+    ]
+    result = await db.organizer_collection.aggregate(pipeline).to_list(length=1)
+    if result:
+        return result[0]
+    return {"total_organizers": 0, "present_organizers": 0, "absent_organizers": 0, "free_organizers": 0}
+
+
+async def get_organizer_statistics() -> dict:
+    return await stats_cache.get_or_compute("organizers", compute_organizer_statistics)
+
+
+async def resolve_organizer_names(organizer_ids: Iterable[str]) -> Dict[str, str]:
+    """Maps organizer ids to full names, loading every id missing from the cache with one $in query."""
+    names, not_cached = name_cache.get_many(set(organizer_ids))
+    missing = [ObjectId(organizer_id) for organizer_id in not_cached if ObjectId.is_valid(organizer_id)]
+
+    if missing:
+        cursor = db.organizer_collection.find({"_id": {"$in": missing}}, {"full_name": 1})
+        async for organizer in cursor:
+            organizer_id = str(organizer["_id"])
+            name_cache.set(organizer_id, organizer["full_name"])
+            names[organizer_id] = organizer["full_name"]
+
+    return names
+
+
+def invalidate_organizer(organizer_id: str):
+    name_cache.invalidate(organizer_id)
+    organizer_index.invalidate()
@@ -0,0 +1,106 @@
+from typing import AsyncIterator, Optional
+from bson import ObjectId
+from fastapi import HTTPException, Query, Response
+from starlette.responses import StreamingResponse
+from services import responseService
+from services.responseService import DocumentSerializer, FastJSONResponse, dumps
+
+MAX_PAGE_SIZE = 1000
+
+
+class PageParams:
+    """Keyset pagination parameters shared by the list endpoints."""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of items to return"),
+        after: Optional[str] = Query(None, description="Return items after this id (the X-Next-Cursor of the previous page)"),
+        stream: bool = Query(False, description="Stream the items as NDJSON instead of a JSON array"),
+    ):
+        if after is not None and not ObjectId.is_valid(after):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        self.limit = limit
+        self.after = ObjectId(after) if after else None
+        self.stream = stream
+
+
+def page_cursor(collection, query: dict, page: PageParams, projection: Optional[dict] = None):
+    """Builds a cursor ordered by _id that starts after the page cursor."""
+    if page.after is not None:
+        query = {"$and": [query, {"_id": {"$gt": page.after}}]} if query else {"_id": {"$gt": page.after}}
+    cursor = collection.find(query, projection).sort("_id", 1)
+    if page.limit:
+        cursor = cursor.limit(page.limit)
+    return cursor
+
+
+async def fetch_page(collection, query: dict, page: PageParams, to_item, projection: Optional[dict] = None) -> tuple:
+    """Returns one page of items and the X-Next-Cursor value when more items may follow."""
+    items = []
+    last_id = None
+    async for document in page_cursor(collection, query, page, projection):
+        last_id = document["_id"]
+        items.append(to_item(document))
+
+    next_cursor = str(last_id) if page.limit and len(items) == page.limit else None
+    return items, next_cursor
+
+
+def stream_items(items: AsyncIterator[dict], ndjson: bool = True) -> StreamingResponse:
+    """Streams items as newline-delimited JSON, or as one JSON array, while they are produced."""
+    async def generate():
+        if ndjson:
+            async for item in items:
+                yield dumps(item) + b"\n"
+            return
+        separator = b"["
+        async for item in items:
+            yield separator + dumps(item)
+            separator = b","
+        yield b"[]" if separator == b"[" else b"]"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson" if ndjson else "application/json")
+
+
+async def peek(items: AsyncIterator) -> tuple:
+    """Returns (first item or None, iterator over all the items): checks a listing is not empty before streaming it."""
+    try:
+        first = await items.__anext__()
+    except StopAsyncIteration:
+        return None, items
+
+    async def chained():
+        yield first
+        async for item in items:
+            yield item
+
+    return first, chained()
+
+
+def stream_ndjson(collection, query: dict, page: PageParams, serializer: DocumentSerializer, projection: Optional[dict] = None) -> StreamingResponse:
+    """Streams items as newline-delimited JSON while the Motor cursor produces them."""
+    async def documents():
+        async for document in page_cursor(collection, query, page, projection):
+            yield serializer.to_dict(document)
+
+    return stream_items(documents())
+
+
+async def list_documents(collection, query: dict, page: PageParams, serializer: DocumentSerializer, response: Response, not_found: str, projection: Optional[dict] = None):
+    """Common body of the list endpoints: NDJSON stream, or a page that 404s when the listing is empty."""
+    if projection is None:
+        projection = serializer.projection
+    if page.stream:
+        return stream_ndjson(collection, query, page, serializer, projection)
+
+    fast = responseService.FAST_JSON_RESPONSES
+    items, next_cursor = await fetch_page(collection, query, page, serializer.to_dict if fast else serializer.to_model, projection)
+    if not items and page.after is None:
+        raise HTTPException(status_code=404, detail=not_found)
+
+    if fast:
+        # Bypasses response_model validation: the documents go straight to JSON bytes
+        response = FastJSONResponse(items)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response if fast else items
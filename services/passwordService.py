@@ -0,0 +1,66 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from passlib.context import CryptContext
+from services.workerService import pool_size_per_worker
+
+# bcrypt releases the GIL while hashing, so a thread pool hashes in parallel
+# without blocking the event loop.
+# Every worker process has its own pool
+PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", pool_size_per_worker()))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+# Only touched from the event loop thread, so no lock is needed
+_stats = {"pending": 0, "completed": 0}
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSWORD_POOL_SIZE, thread_name_prefix="password")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def _run(func, *args):
+    loop = asyncio.get_running_loop()
+    _stats["pending"] += 1
+    try:
+        return await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        _stats["pending"] -= 1
+        _stats["completed"] += 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(pwd_context.hash, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run(pwd_context.verify, plain_password, hashed_password)
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hashes a batch of passwords in parallel across the pool."""
+    return list(await asyncio.gather(*(hash_password(password) for password in passwords)))
+
+
+def get_pool_stats() -> dict:
+    pending = _stats["pending"]
+    return {
+        "pool_size": PASSWORD_POOL_SIZE,
+        "pending": pending,
+        "running": min(pending, PASSWORD_POOL_SIZE),
+        "queue_depth": max(pending - PASSWORD_POOL_SIZE, 0),
+        "completed": _stats["completed"],
+    }
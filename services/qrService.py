@@ -0,0 +1,77 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+import qrcode
+from services.workerService import pool_size_per_worker
+
+# QR codes only encode the participant _id, which never changes, so each code is
+# rendered once and stored under <participant_id>.png.
+QR_CACHE_DIR = Path(os.getenv("QR_CACHE_DIR", Path(__file__).resolve().parent / "../csv/qr_codes")).resolve()
+# Every worker process has its own pool
+QR_POOL_SIZE = int(os.getenv("QR_POOL_SIZE", pool_size_per_worker()))
+QR_RENDER_CHUNK_SIZE = 50
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # The worker already runs threads (Motor, logging, bcrypt pool): forking it could copy a held
+        # lock into a child, so the renderers start from a clean forkserver (spawn where unavailable)
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _executor = ProcessPoolExecutor(max_workers=QR_POOL_SIZE, mp_context=multiprocessing.get_context(method))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def qr_code_path(participant_id: str) -> Path:
+    return QR_CACHE_DIR / f"{participant_id}.png"
+
+
+def render_qr_codes(participant_ids: List[str]) -> List[str]:
+    """Runs in a worker process: renders and saves one PNG per participant id."""
+    for participant_id in participant_ids:
+        # Generate QR Code with no border
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=1
+        )
+        qr.add_data(participant_id)
+        qr.make(fit=True)
+        img = qr.make_image(fill="black", back_color="white")
+
+        # Write to a temporary name first so a half-written file is never served from the cache
+        path = qr_code_path(participant_id)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        img.save(tmp_path)
+        os.replace(tmp_path, path)
+    return participant_ids
+
+
+async def ensure_qr_codes(participant_ids: Iterable[str]) -> Dict[str, Path]:
+    """Returns the cached QR code path of every participant, rendering only the missing ones."""
+    QR_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    paths = {participant_id: qr_code_path(participant_id) for participant_id in participant_ids}
+    missing = [participant_id for participant_id, path in paths.items() if not path.exists()]
+
+    if missing:
+        loop = asyncio.get_running_loop()
+        executor = get_executor()
+        await asyncio.gather(*(
+            loop.run_in_executor(executor, render_qr_codes, missing[start:start + QR_RENDER_CHUNK_SIZE])
+            for start in range(0, len(missing), QR_RENDER_CHUNK_SIZE)
+        ))
+
+    return paths
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Type
+from bson import ObjectId
+from pydantic import BaseModel
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, fall back to the standard library encoder
+    orjson = None
+
+# Opt-in: list endpoints skip the dict -> Pydantic -> dict round trip and encode documents directly
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Compact JSON bytes with ObjectId and datetime support, orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class EncodedJSON:
+    """A JSON body encoded once, with its strong ETag, for responses served from a cache."""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, content: Any):
+        self.body = dumps(content)
+        self.etag = f'"{hashlib.blake2b(self.body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison, as required for If-None-Match
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+def conditional_response(encoded: EncodedJSON, if_none_match: Optional[str]) -> Response:
+    """304 when the client already has this version, the cached body otherwise."""
+    # no-cache: clients keep the body but revalidate it with If-None-Match on every use
+    headers = {"ETag": encoded.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, encoded.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(encoded.body, media_type="application/json", headers=headers)
+
+
+def _model_fields(model: Type[BaseModel]) -> dict:
+    """Field name -> (required, default) for Pydantic v1 and v2 models."""
+    if hasattr(model, "model_fields"):
+        return {name: (field.is_required(), field.default) for name, field in model.model_fields.items()}
+    return {name: (field.required, field.default) for name, field in model.__fields__.items()}
+
+
+class DocumentSerializer:
+    """
+    Maps Motor documents to a *Read schema. The schema is inspected once here;
+    to_dict() then only copies the schema fields (and "_id" as "id") so the
+    result can be encoded without building Pydantic models, and projection
+    asks MongoDB for those fields only.
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        fields = _model_fields(model)
+        self.has_id = "id" in fields
+        self.optional = [(name, default) for name, (required, default) in fields.items() if name != "id" and not required]
+        self.required = [name for name, (required, _) in fields.items() if name != "id" and required]
+        # _id stays in the projection: keyset pagination needs it even when the schema has no id
+        self.projection = {name: 1 for name in fields if name != "id"}
+
+    def to_dict(self, document: dict) -> dict:
+        item = {"id": str(document["_id"])} if self.has_id else {}
+        for name in self.required:
+            # A missing required field is left out so to_model() reports it
+            if name in document:
+                item[name] = document[name]
+        for name, default in self.optional:
+            item[name] = document.get(name, default)
+        return item
+
+    def to_model(self, document: dict) -> BaseModel:
+        return self.model(**self.to_dict(document))
+
+    def many(self, documents: Iterable[dict]) -> List[dict]:
+        return [self.to_dict(document) for document in documents]
+
+
+# One serializer (and projection) per *Read schema, built on first use
+serializers: Dict[Type[BaseModel], DocumentSerializer] = {}
+
+
+def serializer_for(model: Type[BaseModel]) -> DocumentSerializer:
+    serializer = serializers.get(model)
+    if serializer is None:
+        serializer = serializers[model] = DocumentSerializer(model)
+    return serializer
+
+
+def projection_for(model: Type[BaseModel], *extra_fields: str) -> dict:
+    """The MongoDB projection of a schema, plus fields only the server needs (e.g. the password hash on login)."""
+    projection = dict(serializer_for(model).projection)
+    for field in extra_fields:
+        projection[field] = 1
+    return projection
@@ -0,0 +1,128 @@
+import asyncio
+import os
+from typing import Iterable, List, Optional, Set
+from bson import ObjectId
+from db import db
+from services.cacheService import AsyncCache
+from services.loggingService import get_logger
+
+# The id of every participant is kept in memory so a scan checks its participant_qr without a query.
+# Loaded on startup and reloaded every ROSTER_REFRESH_INTERVAL seconds by a background task, never
+# inside a request. Writes of this worker (and of every worker with LIVE_UPDATES_SOURCE=change_streams)
+# update the roster in place; the refresh bounds how long a participant deleted elsewhere stays scannable.
+ROSTER_REFRESH_INTERVAL = float(os.getenv("ROSTER_REFRESH_INTERVAL", 300))
+
+roster_cache = AsyncCache("participant_roster")
+logger = get_logger(__name__)
+
+
+class Roster:
+    """Ids of the participants, as strings."""
+
+    def __init__(self, participant_ids: Iterable[str]):
+        self.ids: Set[str] = set(participant_ids)
+
+    def __contains__(self, participant_id: str) -> bool:
+        return participant_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, participant_id: str):
+        self.ids.add(participant_id)
+
+    def discard(self, participant_id: str):
+        self.ids.discard(participant_id)
+
+
+async def load_roster() -> Roster:
+    cursor = db.participant_collection.find({}, {"_id": 1})
+    return Roster([str(document["_id"]) async for document in cursor])
+
+
+async def get_roster() -> Roster:
+    # Loaded by the lifespan; outside the app (scripts, tests) the first caller loads it
+    return await roster_cache.get_or_compute("roster", load_roster)
+
+
+async def reload_roster() -> Roster:
+    """Replaces the roster with a fresh load; requests keep using the previous one meanwhile."""
+    roster = await load_roster()
+    roster_cache.set("roster", roster)
+    return roster
+
+
+def _loaded() -> Optional[Roster]:
+    return roster_cache.get("roster")
+
+
+def remember_participants(documents: Iterable[dict]):
+    """Adds participants from their stored documents (with _id)."""
+    roster = _loaded()
+    if roster is not None:
+        for document in documents:
+            roster.add(str(document["_id"]))
+
+
+def forget_participant(participant_id: str):
+    roster = _loaded()
+    if roster is not None:
+        roster.discard(participant_id)
+
+
+def apply_change(operation: str, participant_id: str, document: Optional[dict]):
+    """Change stream event of the participants collection."""
+    if operation == "delete":
+        forget_participant(participant_id)
+    elif operation == "insert":
+        remember_participants([{"_id": participant_id}])
+
+
+async def unknown_participants(participant_ids: Iterable[str]) -> set:
+    """
+    Ids that are not participants. Misses of the roster are checked with one $in query,
+    so a participant created by another worker is accepted (and remembered) right away.
+    """
+    roster = await get_roster()
+    missing = {participant_id for participant_id in participant_ids if participant_id not in roster}
+    valid = [ObjectId(participant_id) for participant_id in missing if ObjectId.is_valid(participant_id)]
+    if valid:
+        found: List[dict] = await db.participant_collection.find({"_id": {"$in": valid}}, {"_id": 1}).to_list(None)
+        for document in found:
+            roster.add(str(document["_id"]))
+            missing.discard(str(document["_id"]))
+    return missing
+
+
+async def is_participant(participant_id: str) -> bool:
+    return not await unknown_participants([participant_id])
+
+
+async def _refresh_periodically():
+    while True:
+        await asyncio.sleep(ROSTER_REFRESH_INTERVAL)
+        try:
+            await reload_roster()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # The previous roster stays in use until the next attempt
+            logger.error("Could not refresh the participant roster: %s", e)
+
+
+_refresher: Optional[asyncio.Task] = None
+
+
+def start_refresh():
+    """Starts the background reload of the roster, every ROSTER_REFRESH_INTERVAL seconds."""
+    global _refresher
+    if _refresher is None and ROSTER_REFRESH_INTERVAL > 0:
+        _refresher = asyncio.create_task(_refresh_periodically())
+
+
+async def stop_refresh():
+    global _refresher
+    if _refresher is not None:
+        _refresher.cancel()
+        await asyncio.gather(_refresher, return_exceptions=True)
+        _refresher = None
@@ -0,0 +1,399 @@
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from db import db
+from services import metricsService
+
+# "array": one scanned_tasks document per task holding every participant_qr (legacy layout)
+# "document": one small scans document per (task_id, participant_qr), constant write cost per scan
+SCAN_STORAGE_MODE = os.getenv("SCAN_STORAGE_MODE", "array")
+# POST /scanned-tasks/batch for offline devices. Enabling it makes every live scan stamp
+# its pair's clock first: one more round trip per PUT and POST /scanned-tasks/
+OFFLINE_SCAN_BATCHES = os.getenv("OFFLINE_SCAN_BATCHES", "false").lower() == "true"
+# Records accepted by one POST /scanned-tasks/batch
+SCAN_BATCH_MAX_RECORDS = int(os.getenv("SCAN_BATCH_MAX_RECORDS", 5000))
+
+
+def _scan_update(participant_qr: str, scanned: bool) -> dict:
+    if scanned:
+        return {"$addToSet": {"participant_qr": participant_qr}}
+    return {"$pull": {"participant_qr": participant_qr}}
+
+
+def _status_projection(participant_qr: str) -> dict:
+    # Computed server side so the participant_qr array never leaves MongoDB
+    return {
+        "_id": 0,
+        "task_id": 1,
+        "scanned": {"$in": [participant_qr, {"$ifNull": ["$participant_qr", []]}]},
+        "scanned_count": {"$size": {"$ifNull": ["$participant_qr", []]}},
+    }
+
+
+def uses_scan_documents() -> bool:
+    return SCAN_STORAGE_MODE == "document"
+
+
+async def _set_scan_document(task_id: str, participant_qr: str, scanned: bool, lightweight: bool) -> dict:
+    if scanned:
+        try:
+            await db.scan_collection.update_one(
+                {"task_id": task_id, "participant_qr": participant_qr},
+                {"$setOnInsert": {"scanned_at": datetime.utcnow()}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            pass  # Scanned concurrently by another device, the scan is recorded
+    else:
+        await db.scan_collection.delete_one({"task_id": task_id, "participant_qr": participant_qr})
+
+    if lightweight:
+        return {
+            "task_id": task_id,
+            "participant_qr": participant_qr,
+            "scanned": scanned,
+            "scanned_count": await db.scan_collection.count_documents({"task_id": task_id}),
+        }
+    return {"task_id": task_id, "participant_qr": await get_scanned_ids(task_id)}
+
+
+async def set_scan_status(task_id: str, participant_qr: str, scanned: bool, lightweight: bool = False) -> dict:
+    """
+    Adds or removes a participant from the task's scanned list.
+    In array mode this is a single find_one_and_update round trip that creates
+    the task document on first scan; in document mode it upserts or deletes
+    the (task_id, participant_qr) scan document. With OFFLINE_SCAN_BATCHES the pair's clock
+    is stamped first, see apply_scan_batch.
+    """
+    await _stamp_clocks(task_id, [participant_qr], scanned)
+    if uses_scan_documents():
+        status = await _set_scan_document(task_id, participant_qr, scanned, lightweight)
+        metricsService.record_scans(scanned)
+        return status
+
+    projection = _status_projection(participant_qr) if lightweight else {"_id": 0}
+
+    try:
+        task = await db.scanned_task_collection.find_one_and_update(
+            {"task_id": task_id},
+            _scan_update(participant_qr, scanned),
+            projection=projection,
+            upsert=scanned,  # Un-scanning never needs to create the document
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Another scanner created the document at the same time, it exists now
+        task = await db.scanned_task_collection.find_one_and_update(
+            {"task_id": task_id},
+            _scan_update(participant_qr, scanned),
+            projection=projection,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    metricsService.record_scans(scanned)
+    if task is None:
+        task = {"task_id": task_id, "participant_qr": [], "scanned": False, "scanned_count": 0}
+
+    if lightweight:
+        return {
+            "task_id": task_id,
+            "participant_qr": participant_qr,
+            "scanned": task["scanned"],
+            "scanned_count": task["scanned_count"],
+        }
+    return {"task_id": task["task_id"], "participant_qr": task.get("participant_qr", [])}
+
+
+async def get_scanned_ids(task_id: str) -> list:
+    """Returns the participant_qr of every participant scanned for the task."""
+    if uses_scan_documents():
+        cursor = db.scan_collection.find({"task_id": task_id}, {"participant_qr": 1, "_id": 0})
+        return [scan["participant_qr"] async for scan in cursor]
+
+    task = await db.scanned_task_collection.find_one({"task_id": task_id}, {"participant_qr": 1, "_id": 0})
+    return task["participant_qr"] if task else []
+
+
+async def add_scans(task_id: str, participant_qrs: Iterable[str]) -> list:
+    """Records several scans for a task at once and returns the task's scanned list."""
+    participant_qrs = list(dict.fromkeys(participant_qrs))
+    metricsService.record_scans(True, len(participant_qrs))
+    await _stamp_clocks(task_id, participant_qrs, True)
+    if not uses_scan_documents():
+        await db.scanned_task_collection.update_one(
+            {"task_id": task_id},
+            {"$addToSet": {"participant_qr": {"$each": participant_qrs}}},
+            upsert=True,
+        )
+        return await get_scanned_ids(task_id)
+
+    if participant_qrs:
+        scanned_at = datetime.utcnow()
+        try:
+            await db.scan_collection.insert_many(
+                [{"task_id": task_id, "participant_qr": qr, "scanned_at": scanned_at} for qr in participant_qrs],
+                ordered=False,
+            )
+        except BulkWriteError:
+            pass  # Already scanned participants violate the unique index and are skipped
+    return await get_scanned_ids(task_id)
+
+
+def _clock(timestamp: datetime) -> datetime:
+    """UTC without tzinfo and truncated to the millisecond, as MongoDB stores it, so replays compare equal."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp.replace(microsecond=timestamp.microsecond // 1000 * 1000)
+
+
+_clock_index_ready = False
+
+
+class ScanClockIndexMissing(Exception):
+    """The unique (task_id, participant_qr) index of scan_clocks could not be created."""
+
+
+async def ensure_clock_index():
+    """
+    Last writer wins relies on the unique index: without it an older record upserts a second clock
+    and wins. Created once per process before the first clock write, whatever CREATE_INDEXES_ON_STARTUP says.
+    """
+    global _clock_index_ready
+    if _clock_index_ready:
+        return
+    try:
+        await db.scan_clock_collection.create_indexes(db.INDEXES["scan_clocks"])
+    except OperationFailure as e:
+        raise ScanClockIndexMissing(f"Could not create the unique index of scan_clocks: {e}") from e
+    _clock_index_ready = True
+
+
+async def _stamp_clocks(task_id: str, participant_qrs: List[str], scanned: bool):
+    """
+    Live scans (PUT and POST /scanned-tasks/) happen now: their server time becomes the clock
+    of the pair before the write, so an older offline scan replayed later loses against them.
+    Only needed when offline batches are accepted.
+    """
+    if not OFFLINE_SCAN_BATCHES:
+        return
+    await ensure_clock_index()
+    now = _clock(datetime.utcnow())
+    requests = [
+        UpdateOne(
+            {"task_id": task_id, "participant_qr": participant_qr},
+            {"$set": {"client_timestamp": now, "scanned": scanned, "idempotency_key": None, "claim": None}},
+            upsert=True,
+        )
+        for participant_qr in participant_qrs
+    ]
+    if requests:
+        await _bulk_write_ordered(db.scan_clock_collection, requests)
+
+
+CLOCK_QUERY_PAIRS = 500
+CLOCK_FIELDS = {"_id": 0, "task_id": 1, "participant_qr": 1, "client_timestamp": 1, "scanned": 1, "idempotency_key": 1, "claim": 1}
+
+
+async def _load_clocks(pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], dict]:
+    """(task_id, participant_qr) -> stored clock of the given pairs only, one $or query per chunk of pairs."""
+    pairs = list(dict.fromkeys(pairs))
+    clocks = {}
+    for start in range(0, len(pairs), CLOCK_QUERY_PAIRS):
+        chunk = pairs[start:start + CLOCK_QUERY_PAIRS]
+        query = {"$or": [{"task_id": task_id, "participant_qr": participant_qr} for task_id, participant_qr in chunk]}
+        async for clock in db.scan_clock_collection.find(query, CLOCK_FIELDS):
+            clocks[(clock["task_id"], clock["participant_qr"])] = clock
+    return clocks
+
+
+def _resolve(records: List[dict], clocks: Dict[Tuple[str, str], dict], statuses: List[str], rejected: Dict[int, str]) -> Dict[Tuple[str, str], int]:
+    """
+    Last writer wins per (task_id, participant_qr): only the newest record is a candidate,
+    unless the stored clock is as recent. Fills statuses and returns the candidate record index per pair.
+    """
+    keys = {clock.get("idempotency_key") for clock in clocks.values()} - {None}
+    winners: Dict[Tuple[str, str], int] = {}
+    for index, record in enumerate(records):
+        if index in rejected:
+            statuses[index] = "error"
+            continue
+        key = record.get("idempotency_key")
+        if key is not None:
+            if key in keys:
+                statuses[index] = "duplicate"
+                continue
+            keys.add(key)
+
+        pair = (record["task_id"], record["participant_qr"])
+        statuses[index] = "stale"
+        stored = clocks.get(pair)
+        if stored is not None and record["client_timestamp"] <= stored["client_timestamp"]:
+            continue
+        current = winners.get(pair)
+        # On equal timestamps the later record of the batch wins
+        if current is None or record["client_timestamp"] >= records[current]["client_timestamp"]:
+            winners[pair] = index
+    return winners
+
+
+async def _claim_clocks(records: List[dict], indexes: List[int], claim: ObjectId) -> List[int]:
+    """
+    Moves the clock of each pair forward to its record, only where the stored clock is older.
+    A newer clock (another batch or a live scan) makes the upsert hit the unique index and is kept.
+    Returns the indexes whose claim succeeded.
+    """
+    if not indexes:
+        return []
+    requests = [
+        UpdateOne(
+            {"task_id": records[index]["task_id"], "participant_qr": records[index]["participant_qr"], "client_timestamp": {"$lt": records[index]["client_timestamp"]}},
+            {"$set": {
+                "client_timestamp": records[index]["client_timestamp"],
+                "scanned": records[index]["scanned"],
+                "idempotency_key": records[index].get("idempotency_key"),
+                "claim": claim,
+            }},
+            upsert=True,
+        )
+        for index in indexes
+    ]
+    try:
+        await db.scan_clock_collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as e:
+        if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+
+    clocks = await _load_clocks((records[index]["task_id"], records[index]["participant_qr"]) for index in indexes)
+    return [index for index in indexes if clocks.get((records[index]["task_id"], records[index]["participant_qr"]), {}).get("claim") == claim]
+
+
+async def _release_clocks(pairs: Iterable[Tuple[str, str]], previous: Dict[Tuple[str, str], dict], claim: ObjectId):
+    """
+    Puts back the clock a failed write had claimed, so a retry of the record is applied again
+    instead of reported duplicate or stale. A clock claimed since by a newer writer is left alone.
+    """
+    requests = []
+    for task_id, participant_qr in pairs:
+        ours = {"task_id": task_id, "participant_qr": participant_qr, "claim": claim}
+        clock = previous.get((task_id, participant_qr))
+        if clock is None:
+            requests.append(DeleteOne(ours))
+        else:
+            requests.append(UpdateOne(ours, {"$set": {field: clock.get(field) for field in ("client_timestamp", "scanned", "idempotency_key", "claim")}}))
+    if requests:
+        await db.scan_clock_collection.bulk_write(requests, ordered=False)
+
+
+def _storage_requests(task_id: str, states: List[Tuple[str, bool, datetime]]) -> list:
+    """Writes of (participant_qr, scanned, scanned_at) for one task."""
+    scanned = [participant_qr for participant_qr, is_scanned, _ in states if is_scanned]
+    unscanned = [participant_qr for participant_qr, is_scanned, _ in states if not is_scanned]
+    requests = []
+    if uses_scan_documents():
+        requests.extend(
+            UpdateOne(
+                {"task_id": task_id, "participant_qr": participant_qr},
+                {"$setOnInsert": {"scanned_at": scanned_at}},
+                upsert=True,
+            )
+            for participant_qr, is_scanned, scanned_at in states if is_scanned
+        )
+        if unscanned:
+            requests.append(DeleteMany({"task_id": task_id, "participant_qr": {"$in": unscanned}}))
+        return requests
+
+    if scanned:
+        requests.append(UpdateOne({"task_id": task_id}, {"$addToSet": {"participant_qr": {"$each": scanned}}}, upsert=True))
+    if unscanned:
+        requests.append(UpdateOne({"task_id": task_id}, {"$pull": {"participant_qr": {"$in": unscanned}}}))
+    return requests
+
+
+async def _bulk_write_ordered(collection, requests: list, retries: int = 3):
+    """Ordered bulk_write that resumes after a duplicate key raised by a concurrent upsert."""
+    start = 0
+    while True:
+        try:
+            return await collection.bulk_write(requests[start:], ordered=True)
+        except BulkWriteError as e:
+            error = e.details["writeErrors"][0]
+            if error.get("code") != 11000 or not retries:
+                raise
+            # The document exists now, replaying the failed upsert updates it
+            retries -= 1
+            start += error["index"]
+
+
+async def _write_states(states: Dict[Tuple[str, str], Tuple[bool, datetime]]) -> Dict[Tuple[str, str], str]:
+    """One ordered bulk_write per task; returns the pairs whose task failed, with the error."""
+    by_task: Dict[str, List[Tuple[str, bool, datetime]]] = {}
+    for (task_id, participant_qr), (scanned, scanned_at) in states.items():
+        by_task.setdefault(task_id, []).append((participant_qr, scanned, scanned_at))
+
+    collection = db.scan_collection if uses_scan_documents() else db.scanned_task_collection
+    failed = {}
+    for task_id, task_states in by_task.items():
+        try:
+            await _bulk_write_ordered(collection, _storage_requests(task_id, task_states))
+        except BulkWriteError as e:
+            failed.update({(task_id, participant_qr): str(e) for participant_qr, _, _ in task_states})
+    return failed
+
+
+async def apply_scan_batch(records: List[dict], rejected: Optional[Dict[int, str]] = None) -> List[dict]:
+    """
+    Applies scans replayed by offline devices and returns one result per record.
+    Per (task_id, participant_qr) the newest client_timestamp wins, against the clock stored by
+    earlier batches and live scans:
+    - the newest record of each pair claims the clock with a conditional upsert,
+    - only the claimed pairs are written, with one ordered bulk_write per task; the clock of
+      a pair whose write failed is released so the device can retry the record,
+    - the clocks are read back: a pair claimed meanwhile by a newer writer is rewritten
+      with that writer's state, whichever storage write landed last.
+    rejected maps the index of records refused by the caller to their error.
+    """
+    await ensure_clock_index()
+    for record in records:
+        record["client_timestamp"] = _clock(record["client_timestamp"])
+    statuses = [""] * len(records)
+    errors: Dict[int, str] = dict(rejected or {})
+    pairs = [(record["task_id"], record["participant_qr"]) for record in records]
+    clocks = await _load_clocks(pairs)
+    winners = _resolve(records, clocks, statuses, errors)
+
+    claim = ObjectId()
+    claimed = await _claim_clocks(records, list(winners.values()), claim)
+    failed = await _write_states({
+        pairs[index]: (records[index]["scanned"], records[index]["client_timestamp"]) for index in claimed
+    })
+    for index in claimed:
+        if pairs[index] in failed:
+            statuses[index] = "error"
+            errors[index] = failed[pairs[index]]
+        else:
+            statuses[index] = "applied"
+            metricsService.record_scans(records[index]["scanned"])
+    if failed:
+        await _release_clocks(failed, clocks, claim)
+
+    # A newer writer may have claimed a pair after us and written its storage before ours
+    applied = [pairs[index] for index in claimed if statuses[index] == "applied"]
+    current = await _load_clocks(applied) if applied else {}
+    overtaken = {
+        pair: (clock["scanned"], clock["client_timestamp"])
+        for pair, clock in current.items() if clock.get("claim") != claim and "scanned" in clock
+    }
+    if overtaken:
+        await _write_states(overtaken)
+
+    results = []
+    for index, record in enumerate(records):
+        result = {"index": index, "task_id": record["task_id"], "participant_qr": record["participant_qr"], "status": statuses[index]}
+        if index in errors:
+            result["error"] = errors[index]
+        results.append(result)
+    metricsService.record_scan_batch(statuses)
+    return results
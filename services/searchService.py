@@ -0,0 +1,149 @@
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+from fastapi import HTTPException
+from pydantic import BaseModel
+from db import db
+from schemas.admin import AdminRead
+from schemas.organizers import OrganizerRead
+from schemas.participants import ParticipantRead
+from schemas.tasks import TaskRead
+from services.cacheService import AsyncCache
+from services import responseService
+from services.responseService import FastJSONResponse, serializer_for
+
+# Each index is built in memory from one projected find and rebuilt on the next
+# search after a write of this worker. The TTL bounds how long the other workers
+# search the previous version.
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", 60))
+SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", 20))
+
+index_cache = AsyncCache("search_indexes", ttl=SEARCH_INDEX_TTL)
+
+_WORD = re.compile(r"[^\W_]+")
+_LAST = "\U0010ffff"
+
+
+def normalize(text: str) -> str:
+    """Lowercase without accents, so "Hélène" is found by "hel"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD.findall(normalize(text))
+
+
+class BuiltIndex:
+    """Sorted (term, posting) arrays: every prefix is one bisect range."""
+
+    def __init__(self, items: List[dict], fields: Dict[str, int], sort_field: str):
+        self.items = items
+        self.sort_keys = [normalize(item.get(sort_field) or "") for item in items]
+        entries = []
+        for position, item in enumerate(items):
+            for field in fields:
+                value = item.get(field)
+                if isinstance(value, str):
+                    for word_position, term in enumerate(tokenize(value)):
+                        entries.append((term, position, field, word_position))
+        entries.sort()
+        self.terms = [entry[0] for entry in entries]
+        self.postings = [entry[1:] for entry in entries]
+
+    def matches(self, token: str, fields: Dict[str, int]) -> Dict[int, int]:
+        """Item position -> best score of the terms starting with token."""
+        scores: Dict[int, int] = {}
+        start = bisect_left(self.terms, token)
+        end = bisect_left(self.terms, token + _LAST, start)
+        for term, (position, field, word_position) in zip(self.terms[start:end], self.postings[start:end]):
+            weight = fields.get(field)
+            if weight is None:
+                continue
+            # Whole word > prefix of the first word > prefix of a later word
+            score = weight * (3 if term == token else 2 if word_position == 0 else 1)
+            if score > scores.get(position, 0):
+                scores[position] = score
+        return scores
+
+
+class SearchIndex:
+    """Ranked type-ahead search over the *Read fields of one collection."""
+
+    def __init__(self, name: str, collection: str, model: Type[BaseModel], fields: Dict[str, int]):
+        self.name = name
+        self.collection = collection
+        self.serializer = serializer_for(model)
+        self.fields = fields
+        # The heaviest field orders results of equal score
+        self.sort_field = max(fields, key=fields.get)
+
+    async def build(self) -> BuiltIndex:
+        cursor = getattr(db, self.collection).find({}, self.serializer.projection)
+        items = [self.serializer.to_dict(document) async for document in cursor]
+        return BuiltIndex(items, self.fields, self.sort_field)
+
+    async def get(self) -> BuiltIndex:
+        return await index_cache.get_or_compute(self.name, self.build)
+
+    def invalidate(self):
+        index_cache.invalidate(self.name)
+
+    async def search(self, query: str, limit: Optional[int] = SEARCH_RESULT_LIMIT, fields: Optional[Iterable[str]] = None, where: Optional[dict] = None) -> List[dict]:
+        """
+        Items matching every word of the query as a word prefix, best first.
+        fields restricts the searched fields; where keeps the items equal to each value.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        weights = {field: self.fields[field] for field in fields} if fields else self.fields
+        index = await self.get()
+
+        scores: Optional[Dict[int, int]] = None
+        for token in dict.fromkeys(tokens):
+            token_scores = index.matches(token, weights)
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {position: score + token_scores[position] for position, score in scores.items() if position in token_scores}
+            if not scores:
+                return []
+
+        positions = scores.keys()
+        if where:
+            positions = [position for position in positions if all(index.items[position].get(k) == v for k, v in where.items())]
+        ranked = sorted(positions, key=lambda position: (-scores[position], index.sort_keys[position]))
+        return [index.items[position] for position in ranked[:limit]]
+
+    async def search_all(self, criteria: List[Tuple[Optional[str], Optional[str]]], limit: Optional[int] = SEARCH_RESULT_LIMIT) -> List[dict]:
+        """
+        Items matching every (field, query) criterion, ranked by the first one.
+        A None field searches every field; empty queries are ignored.
+        """
+        results = None
+        for field, query in criteria:
+            if not query:
+                continue
+            found = await self.search(query, limit=None, fields=[field] if field else None)
+            if results is None:
+                results = found
+            else:
+                ids = {item["id"] for item in found}
+                results = [item for item in results if item["id"] in ids]
+        return (results or [])[:limit]
+
+
+participant_index = SearchIndex("participants", "participant_collection", ParticipantRead, {"full_name": 3, "email": 2, "team": 1})
+organizer_index = SearchIndex("organizers", "organizer_collection", OrganizerRead, {"full_name": 3, "email": 2, "department": 1})
+admin_index = SearchIndex("admins", "admin_collection", AdminRead, {"full_name": 3, "email": 2, "department": 1})
+task_index = SearchIndex("tasks", "task_collection", TaskRead, {"name": 3, "location": 2, "description": 1})
+
+
+def search_results(items: List[dict], not_found: str):
+    """Response of the /1/search endpoints, ranked items already in their *Read shape."""
+    if not items:
+        raise HTTPException(status_code=404, detail=not_found)
+    return FastJSONResponse(items) if responseService.FAST_JSON_RESPONSES else items
@@ -0,0 +1,103 @@
+import os
+from datetime import datetime
+from typing import Iterable, List
+from db import db
+from services.cacheService import AsyncCache
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", 5))
+# Writes invalidate the schedules they touch; the TTL bounds staleness across workers
+SCHEDULE_CACHE_TTL = float(os.getenv("SCHEDULE_CACHE_TTL", 30))
+SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", 1024))
+
+stats_cache = AsyncCache("statistics", ttl=STATS_CACHE_TTL)
+schedule_cache = AsyncCache("organizer_schedules", ttl=SCHEDULE_CACHE_TTL, maxsize=SCHEDULE_CACHE_SIZE)
+
+TASK_FIELDS = ["name", "start_time", "end_time", "day", "location", "description", "is_complete", "is_check_in"]
+
+
+async def compute_task_statistics() -> dict:
+    pipeline = [
+        {"$group": {
+            "_id": None,
+            "total_tasks": {"$sum": 1},
+            "finished_tasks": {"$sum": {"$cond": [{"$eq": ["$is_complete", True]}, 1, 0]}},
+            "late_tasks": {"$sum": {"$cond": [
+                # null and missing sort before any date: only tasks with an end_time can be late
+                {"$and": [
+                    {"$eq": ["$is_complete", False]},
+                    {"$gt": ["$end_time", None]},
+                    {"$lt": ["$end_time", datetime.utcnow()]},
+                ]}, 1, 0
+            ]}},
+        }},
+    ]
+    result = await db.task_collection.aggregate(pipeline).to_list(length=1)
+    counts = result[0] if result else {"total_tasks": 0, "finished_tasks": 0, "late_tasks": 0}
+
+    total_tasks = counts["total_tasks"]
+    progress = (counts["finished_tasks"] / total_tasks) * 100 if total_tasks > 0 else 0
+
+    return {
+        "total_tasks": total_tasks,
+        "finished_tasks": counts["finished_tasks"],
+        "late_tasks": counts["late_tasks"],
+        "progress": round(progress, 2)
+    }
+
+
+async def get_task_statistics() -> dict:
+    return await stats_cache.get_or_compute("tasks", compute_task_statistics)
+
+
+async def compute_organizer_schedule(organizer_id: str) -> List[dict]:
+    """Tasks of an organizer, as assignee or supervisor, in a single aggregation."""
+    pipeline = [
+        {"$match": {"$or": [{"organizer_id": organizer_id}, {"supervisor_id": organizer_id}]}},
+        {"$project": {
+            "task_oid": {"$convert": {"input": "$task_id", "to": "objectId", "onError": None, "onNull": None}},
+            "is_supervisor": {"$in": [organizer_id, {"$ifNull": ["$supervisor_id", []]}]},
+        }},
+        {"$match": {"task_oid": {"$ne": None}}},
+        # Supervisor role wins when the organizer has both roles on a task
+        {"$group": {"_id": "$task_oid", "is_supervisor": {"$max": "$is_supervisor"}}},
+        {"$lookup": {"from": db.task_collection.name, "localField": "_id", "foreignField": "_id", "as": "task"}},
+        {"$unwind": "$task"},
+        {"$project": {**{field: f"$task.{field}" for field in TASK_FIELDS}, "is_supervisor": 1}},
+        {"$sort": {"day": 1, "start_time": 1, "_id": 1}},
+    ]
+
+    tasks = []
+    async for task in db.assigned_task_collection.aggregate(pipeline):
+        task["id"] = str(task.pop("_id"))
+        tasks.append(task)
+    return tasks
+
+
+async def get_organizer_schedule(organizer_id: str) -> List[dict]:
+    return await schedule_cache.get_or_compute(organizer_id, lambda: compute_organizer_schedule(organizer_id))
+
+
+def invalidate_schedules(organizer_ids: Iterable[str]):
+    for organizer_id in set(organizer_ids):
+        schedule_cache.invalidate(organizer_id)
+
+
+def assignment_members(*assignments) -> set:
+    """Organizer and supervisor ids of the given assigned task documents."""
+    members = set()
+    for assignment in assignments:
+        if assignment:
+            members.update(assignment.get("organizer_id") or [])
+            members.update(assignment.get("supervisor_id") or [])
+    return members
+
+
+async def task_members(task_id: str) -> set:
+    """Organizer and supervisor ids assigned to the task."""
+    cursor = db.assigned_task_collection.find({"task_id": task_id}, {"organizer_id": 1, "supervisor_id": 1})
+    return assignment_members(*[assignment async for assignment in cursor])
+
+
+async def invalidate_task_schedules(task_id: str):
+    """Drops the cached schedule of everyone assigned to the task."""
+    invalidate_schedules(await task_members(task_id))
@@ -0,0 +1,151 @@
+import functools
+import inspect
+import logging
+import os
+import random
+import time
+from fastapi.routing import APIRoute
+from db.monitoring import RequestMetrics, current_request
+from services import metricsService
+from services.loggingService import get_logger
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 500))
+SLOW_REQUEST_SAMPLE_RATE = float(os.getenv("SLOW_REQUEST_SAMPLE_RATE", 1.0))
+# Requests issuing more MongoDB commands than this are logged with their repeated commands (0 disables)
+DB_QUERY_BUDGET = int(os.getenv("DB_QUERY_BUDGET", 20))
+
+logger = get_logger("requests")
+slow_logger = get_logger("slow_requests")
+
+
+def route_template(scope) -> str:
+    """Path template of the matched route with its router prefix, "unmatched" for 404s."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    # FastAPI versions that include routers lazily keep the prefixed path in the route context
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(context, "path", None) or route.path
+
+
+def _timed_endpoint(endpoint):
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            metrics = current_request.get()
+            if metrics is not None:
+                metrics.handler_time += time.perf_counter() - start
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    Route that records how long the endpoint itself ran and how long the whole
+    route took; the difference is mostly response validation and serialization.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+
+        async def timed_route_handler(request):
+            start = time.perf_counter()
+            try:
+                return await route_handler(request)
+            finally:
+                metrics = current_request.get()
+                if metrics is not None:
+                    metrics.route_time += time.perf_counter() - start
+
+        return timed_route_handler
+
+
+class RequestTimingMiddleware:
+    """
+    Pure ASGI middleware: tracks each HTTP request in a RequestMetrics, adds
+    Server-Timing and X-DB-Queries / X-DB-Time headers (except to streamed
+    responses) and logs handler, database and serialization times.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        status_code = 500
+        event_stream = False
+
+        async def send_with_timing(message):
+            nonlocal status_code, event_stream
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                event_stream = (b"content-type", b"text/event-stream; charset=utf-8") in headers
+                # A streamed body (no content-length) queries after its headers are sent:
+                # its counts would read 0, they are only logged once the stream ends
+                if any(name == b"content-length" for name, _ in headers):
+                    headers.append((b"server-timing", self._server_timing(metrics, time.perf_counter() - start).encode()))
+                    headers.append((b"x-db-queries", str(metrics.db_queries).encode()))
+                    headers.append((b"x-db-time", f"{metrics.db_time * 1000:.2f}".encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_request.reset(token)
+            elapsed = time.perf_counter() - start
+            # Unmatched paths share one label so scanners of random URLs cannot grow the series
+            metricsService.observe_request(scope["method"], route_template(scope), status_code, elapsed, event_stream)
+            # Event streams stay open for the whole session, their duration is not latency
+            if not event_stream:
+                self._log(scope, status_code, metrics, elapsed)
+
+    @staticmethod
+    def _server_timing(metrics: RequestMetrics, elapsed: float) -> str:
+        return (
+            f"handler;dur={metrics.handler_time * 1000:.2f}, "
+            f"db;dur={metrics.db_time * 1000:.2f};desc=\"{metrics.db_queries} queries\", "
+            f"serialize;dur={max(metrics.route_time - metrics.handler_time, 0) * 1000:.2f}, "
+            f"total;dur={elapsed * 1000:.2f}"
+        )
+
+    @staticmethod
+    def _log(scope, status_code: int, metrics: RequestMetrics, elapsed: float):
+        total_ms = elapsed * 1000
+        slow = total_ms >= SLOW_REQUEST_MS
+        over_budget = DB_QUERY_BUDGET and metrics.db_queries > DB_QUERY_BUDGET
+        if not slow and not over_budget and not logger.isEnabledFor(logging.DEBUG):  # Skip building the record when DEBUG is off
+            return
+
+        fields = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_template(scope),
+            "status": status_code,
+            "total_ms": round(total_ms, 2),
+            "handler_ms": round(metrics.handler_time * 1000, 2),
+            "db_ms": round(metrics.db_time * 1000, 2),
+            "db_queries": metrics.db_queries,
+            "serialize_ms": round(max(metrics.route_time - metrics.handler_time, 0) * 1000, 2),
+        }
+        logger.debug("request", extra={"fields": fields})
+        if over_budget:
+            # Commands repeated within one request are the usual N+1 suspects
+            logger.warning("query budget exceeded", extra={"fields": {
+                **fields, "query_budget": DB_QUERY_BUDGET, "repeated_commands": metrics.repeated_commands(),
+            }})
+        if slow and random.random() < SLOW_REQUEST_SAMPLE_RATE:
+            slow_logger.warning("slow request", extra={"fields": fields})
@@ -0,0 +1,11 @@
+import os
+
+# Worker processes of the server, one per CPU by default. Caches and the "local" live updates
+# are per worker: main.py warns when several workers run with LIVE_UPDATES_SOURCE=local.
+# gunicorn reads the same variable for its default -w.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+
+
+def pool_size_per_worker() -> int:
+    """Default size of a per-process CPU pool: the cores shared between the workers."""
+    return max((os.cpu_count() or 1) // WEB_CONCURRENCY, 1)
@@ -0,0 +1,18 @@
+"""
+Tests run against the in-memory MongoDB stand-in of the benchmarks (mongomock-motor),
+with the registry indexes applied so unique keys behave like in production.
+"""
+import asyncio
+import pytest
+from benchmarks.standin import bind_standin
+from db import db
+from services import cacheService
+
+
+@pytest.fixture
+def standin():
+    bind_standin()
+    asyncio.run(db.ensure_indexes())
+    for cache in cacheService.caches.values():
+        cache.clear()
+    return db
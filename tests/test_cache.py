@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime, timedelta
+from services.cacheService import AsyncCache
+from services.tasksService import compute_task_statistics
+
+
+def test_cancelling_the_first_caller_does_not_fail_the_others():
+    async def scenario():
+        cache = AsyncCache("test_coalesced")
+        release = asyncio.Event()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await release.wait()
+            return "value"
+
+        first = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "value"
+        assert first.cancelled()
+        assert calls == [1]
+        assert cache.get("k") == "value"
+
+    asyncio.run(scenario())
+
+
+def test_invalidated_computation_is_not_stored():
+    async def scenario():
+        cache = AsyncCache("test_invalidated")
+
+        async def compute():
+            cache.invalidate("k")  # A write lands while the value is computed
+            return "stale"
+
+        assert await cache.get_or_compute("k", compute) == "stale"
+        assert cache.get("k") is None
+
+    asyncio.run(scenario())
+
+
+def test_tasks_without_end_time_are_not_late(standin):
+    async def scenario():
+        await standin.task_collection.insert_many([
+            {"name": "late", "is_complete": False, "end_time": datetime.utcnow() - timedelta(hours=1)},
+            {"name": "open", "is_complete": False, "end_time": None},
+            {"name": "no end", "is_complete": False},
+            {"name": "done", "is_complete": True, "end_time": datetime.utcnow() - timedelta(hours=1)},
+        ])
+        statistics = await compute_task_statistics()
+        assert (statistics["total_tasks"], statistics["late_tasks"], statistics["finished_tasks"]) == (4, 1, 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,32 @@
+import asyncio
+import pytest
+from pymongo.errors import BulkWriteError
+from db.migrate_scans import migrate_scans
+
+
+def test_rerun_counts_copied_scans_as_already_present(standin):
+    async def scenario():
+        await standin.scanned_task_collection.insert_one({"task_id": "t1", "participant_qr": ["a", "b"]})
+        await standin.scan_collection.insert_one({"task_id": "t1", "participant_qr": "a"})
+
+        stats = await migrate_scans(delete_source=True)
+        assert (stats["inserted"], stats["already_present"]) == (1, 1)
+        assert await standin.scan_collection.count_documents({"task_id": "t1"}) == 2
+        assert await standin.scanned_task_collection.count_documents({}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_other_write_errors_keep_the_source(standin, monkeypatch):
+    async def failing_bulk_write(requests, ordered=True):
+        raise BulkWriteError({"nInserted": 0, "writeErrors": [{"index": 0, "code": 121, "errmsg": "Document failed validation"}]})
+
+    async def scenario():
+        await standin.scanned_task_collection.insert_one({"task_id": "t1", "participant_qr": ["a"]})
+        monkeypatch.setattr(standin.scan_collection, "bulk_write", failing_bulk_write)
+
+        with pytest.raises(RuntimeError, match="Document failed validation"):
+            await migrate_scans(delete_source=True)
+        assert await standin.scanned_task_collection.count_documents({}) == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,20 @@
+import asyncio
+from datetime import datetime
+import httpx
+
+
+def test_next_cursor_is_exposed_to_browsers(standin):
+    from main import app
+
+    async def scenario():
+        await standin.task_collection.insert_many([
+            {"name": f"t{i}", "start_time": datetime(2026, 10, 18, 9), "end_time": datetime(2026, 10, 18, 10), "day": datetime(2026, 10, 18),
+             "location": "hall", "description": "", "is_complete": False, "is_check_in": False}
+            for i in range(3)
+        ])
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/tasks/", params={"limit": 2}, headers={"Origin": "http://front.example"})
+        assert response.headers["x-next-cursor"]
+        assert "x-next-cursor" in response.headers["access-control-expose-headers"].lower()
+
+    asyncio.run(scenario())
@@ -0,0 +1,23 @@
+import io
+import zipfile
+from bson import ObjectId
+from api.endpoints.participants import iter_export_zip
+from services.qrService import QR_CACHE_DIR
+
+
+def test_zip_export_is_written_entry_by_entry(tmp_path):
+    participants = [{"_id": ObjectId(), "full_name": f"p{i}"} for i in range(3)]
+    qr_paths = {}
+    for participant in participants:
+        path = tmp_path / f"{participant['_id']}.png"
+        path.write_bytes(b"png " + str(participant["_id"]).encode())
+        qr_paths[str(participant["_id"])] = path
+
+    chunks = list(iter_export_zip(participants, qr_paths))
+    assert len([chunk for chunk in chunks if chunk]) >= len(participants) + 1
+
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.testzip() is None
+        assert archive.read("participants.csv").decode().splitlines()[1].startswith("p0,")
+        participant_id = str(participants[2]["_id"])
+        assert archive.read(f"{QR_CACHE_DIR.name}/{participant_id}.png") == b"png " + participant_id.encode()
@@ -0,0 +1,17 @@
+import asyncio
+from services import qrService
+
+
+def test_missing_codes_are_rendered_by_the_pool(tmp_path, monkeypatch):
+    # The pool processes import qrService afresh: they read the directory from the environment
+    monkeypatch.setenv("QR_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(qrService, "QR_CACHE_DIR", tmp_path)
+    (tmp_path / "cached.png").write_bytes(b"cached")
+
+    try:
+        paths = asyncio.run(qrService.ensure_qr_codes(["cached", "6ad4d9b2f1d73a41a2586d54"]))
+    finally:
+        qrService.shutdown_executor()
+
+    assert paths["cached"].read_bytes() == b"cached"
+    assert paths["6ad4d9b2f1d73a41a2586d54"].read_bytes().startswith(b"\x89PNG")
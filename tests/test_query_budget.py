@@ -0,0 +1,57 @@
+import asyncio
+from datetime import datetime
+import httpx
+from db.monitoring import assert_max_queries, track_queries
+from services.tasksService import get_organizer_schedule
+
+
+def client():
+    from main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def seed_tasks(standin, count=3):
+    await standin.task_collection.insert_many([
+        {"name": f"t{i}", "start_time": datetime(2026, 10, 18, 9), "end_time": datetime(2026, 10, 18, 10), "day": datetime(2026, 10, 18),
+         "location": "hall", "description": "", "is_complete": False, "is_check_in": False}
+        for i in range(count)
+    ])
+
+
+def test_task_page_stays_within_its_query_budget(standin):
+    async def scenario():
+        await seed_tasks(standin)
+        async with client() as http:
+            response = await http.get("/tasks/", params={"limit": 2})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        assert_max_queries(response, 2, "GET /tasks/")
+
+    asyncio.run(scenario())
+
+
+def test_streamed_responses_have_no_query_headers(standin):
+    async def scenario():
+        await seed_tasks(standin)
+        async with client() as http:
+            response = await http.get("/tasks/", params={"stream": "true"})
+        assert response.status_code == 200
+        assert len(response.text.splitlines()) == 3
+        # Sent before the stream queries, the count would always read 0
+        assert "x-db-queries" not in response.headers
+        assert "server-timing" not in response.headers
+
+    asyncio.run(scenario())
+
+
+def test_cached_schedule_issues_no_queries(standin):
+    async def scenario():
+        with track_queries() as first:
+            await get_organizer_schedule("o1")
+        assert first.db_queries >= 1
+        with track_queries() as second:
+            await get_organizer_schedule("o1")
+        assert_max_queries(second, 0, "cached schedule")
+
+    asyncio.run(scenario())
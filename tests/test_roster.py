@@ -0,0 +1,49 @@
+import asyncio
+from db.monitoring import track_queries
+from services import rosterService
+from services.rosterService import reload_roster, unknown_participants
+
+
+async def insert_participants(standin, count):
+    start = await standin.participant_collection.count_documents({})
+    result = await standin.participant_collection.insert_many([
+        {"full_name": f"p{i}", "email": f"{i}@x.y", "phone": "1"} for i in range(start, start + count)
+    ])
+    return [str(inserted_id) for inserted_id in result.inserted_ids]
+
+
+def test_known_ids_are_checked_without_a_query(standin):
+    async def scenario():
+        ids = await insert_participants(standin, 2)
+        roster = await reload_roster()
+        assert roster.ids == set(ids)
+
+        with track_queries() as metrics:
+            assert await unknown_participants(ids) == set()
+        assert metrics.db_queries == 0
+
+        # Created by another worker: looked up once, then remembered
+        other = (await insert_participants(standin, 1))[0]
+        assert await unknown_participants([other, "unknown"]) == {"unknown"}
+        assert other in roster
+
+    asyncio.run(scenario())
+
+
+def test_roster_is_refreshed_in_the_background(standin, monkeypatch):
+    monkeypatch.setattr(rosterService, "ROSTER_REFRESH_INTERVAL", 0.01)
+
+    async def scenario():
+        ids = await insert_participants(standin, 2)
+        await reload_roster()
+        # Deleted by another worker, without a change stream
+        await standin.participant_collection.delete_many({})
+
+        rosterService.start_refresh()
+        try:
+            await asyncio.sleep(0.05)
+        finally:
+            await rosterService.stop_refresh()
+        assert await unknown_participants(ids) == set(ids)
+
+    asyncio.run(scenario())
@@ -0,0 +1,203 @@
+import asyncio
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, OperationFailure
+from db.monitoring import track_queries
+from services import scanService
+from services.scanService import apply_scan_batch, get_scanned_ids, set_scan_status
+
+T0 = datetime(2026, 10, 18, 10, 0, 0)
+
+
+def record(participant_qr, minutes, scanned=True, key=None, task_id="t1"):
+    return {
+        "task_id": task_id,
+        "participant_qr": participant_qr,
+        "scanned": scanned,
+        "client_timestamp": T0 + timedelta(minutes=minutes),
+        "idempotency_key": key,
+    }
+
+
+def statuses(results):
+    return [result["status"] for result in results]
+
+
+@pytest.fixture(autouse=True)
+def offline_batches(monkeypatch):
+    monkeypatch.setattr(scanService, "OFFLINE_SCAN_BATCHES", True)
+
+
+@pytest.fixture(params=["array", "document"])
+def storage_mode(request, standin, monkeypatch):
+    monkeypatch.setattr(scanService, "SCAN_STORAGE_MODE", request.param)
+    return request.param
+
+
+def test_newest_record_of_a_pair_wins(storage_mode):
+    async def scenario():
+        results = await apply_scan_batch([
+            record("a", 5, scanned=False),
+            record("a", 1),
+            record("b", 1),
+            record("b", 2, scanned=False),
+        ])
+        assert statuses(results) == ["applied", "stale", "stale", "applied"]
+        assert await get_scanned_ids("t1") == []
+
+        # An older batch flushed later loses against the stored clocks
+        results = await apply_scan_batch([record("a", 3), record("b", 9)])
+        assert statuses(results) == ["stale", "applied"]
+        assert await get_scanned_ids("t1") == ["b"]
+
+    asyncio.run(scenario())
+
+
+def test_idempotency_keys_report_replays_as_duplicates(storage_mode):
+    async def scenario():
+        batch = [record("a", 1, key="d1-1"), record("b", 1, key="d1-2"), record("b", 2, scanned=False, key="d1-3")]
+        assert statuses(await apply_scan_batch([dict(r) for r in batch])) == ["applied", "stale", "applied"]
+
+        # The last applied record of each pair is a duplicate, a superseded one stays stale
+        assert statuses(await apply_scan_batch([dict(r) for r in batch])) == ["duplicate", "stale", "duplicate"]
+        # A key repeated inside one batch
+        assert statuses(await apply_scan_batch([record("c", 1, key="k"), record("c", 2, key="k")])) == ["applied", "duplicate"]
+        assert sorted(await get_scanned_ids("t1")) == ["a", "c"]
+
+    asyncio.run(scenario())
+
+
+def test_live_scan_wins_over_an_older_offline_replay(storage_mode):
+    async def scenario():
+        await set_scan_status("t1", "a", True)
+        await set_scan_status("t1", "a", False)
+        # Scanned offline an hour ago, replayed after the desk un-scanned the participant
+        old = {**record("a", 0), "client_timestamp": datetime.utcnow() - timedelta(hours=1)}
+        assert statuses(await apply_scan_batch([old])) == ["stale"]
+        assert await get_scanned_ids("t1") == []
+
+    asyncio.run(scenario())
+
+
+def test_a_newer_clock_blocks_the_claim(storage_mode, standin, monkeypatch):
+    load_clocks = scanService._load_clocks
+
+    async def load_then_concurrent_batch(pairs):
+        # Another batch stores a newer clock between our read and our claim
+        monkeypatch.setattr(scanService, "_load_clocks", load_clocks)
+        clocks = await load_clocks(pairs)
+        await standin.scan_clock_collection.insert_one({
+            "task_id": "t1", "participant_qr": "a", "client_timestamp": T0 + timedelta(minutes=9),
+            "scanned": False, "claim": ObjectId(),
+        })
+        return clocks
+
+    async def scenario():
+        monkeypatch.setattr(scanService, "_load_clocks", load_then_concurrent_batch)
+        assert statuses(await apply_scan_batch([record("a", 1)])) == ["stale"]
+        assert await get_scanned_ids("t1") == []
+
+    asyncio.run(scenario())
+
+
+def test_a_writer_overtaking_after_the_claim_is_repaired(storage_mode, monkeypatch):
+    claim_clocks = scanService._claim_clocks
+
+    async def claim_then_live_unscan(records, indexes, claim):
+        claimed = await claim_clocks(records, indexes, claim)
+        # A desk un-scans live after our claim, its write lands before ours
+        await set_scan_status("t1", "a", False)
+        return claimed
+
+    async def scenario():
+        monkeypatch.setattr(scanService, "_claim_clocks", claim_then_live_unscan)
+        old = {**record("a", 0), "client_timestamp": datetime.utcnow() - timedelta(minutes=1)}
+        assert statuses(await apply_scan_batch([old])) == ["applied"]
+        assert await get_scanned_ids("t1") == []
+
+    asyncio.run(scenario())
+
+
+def test_a_failed_write_releases_the_clock_for_the_retry(storage_mode, monkeypatch):
+    bulk_write_ordered = scanService._bulk_write_ordered
+
+    async def failing_once(collection, requests, retries=3):
+        monkeypatch.setattr(scanService, "_bulk_write_ordered", bulk_write_ordered)
+        raise BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "Document failed validation"}]})
+
+    async def scenario():
+        await apply_scan_batch([record("b", 0, key="k0")])
+        monkeypatch.setattr(scanService, "_bulk_write_ordered", failing_once)
+        batch = [record("a", 1, key="k1"), record("b", 1, scanned=False, key="k2")]
+        assert statuses(await apply_scan_batch([dict(r) for r in batch])) == ["error", "error"]
+        # The device retries the records that came back as errors
+        assert statuses(await apply_scan_batch([dict(r) for r in batch])) == ["applied", "applied"]
+        assert await get_scanned_ids("t1") == ["a"]
+
+    asyncio.run(scenario())
+
+
+def test_live_scans_skip_the_clock_without_offline_batches(standin, monkeypatch):
+    monkeypatch.setattr(scanService, "OFFLINE_SCAN_BATCHES", False)
+
+    async def scenario():
+        with track_queries() as metrics:
+            await set_scan_status("t1", "a", True)
+        assert metrics.db_queries == 1
+        assert await standin.scan_clock_collection.count_documents({}) == 0
+
+    asyncio.run(scenario())
+
+
+def test_clocks_are_loaded_for_the_sent_pairs_only(standin):
+    async def scenario():
+        await standin.scan_clock_collection.insert_many([
+            {"task_id": "t1", "participant_qr": "b", "client_timestamp": T0},
+            {"task_id": "t2", "participant_qr": "a", "client_timestamp": T0},
+        ])
+        assert await scanService._load_clocks([("t1", "a"), ("t2", "b")]) == {}
+        assert list(await scanService._load_clocks([("t1", "b")])) == [("t1", "b")]
+
+    asyncio.run(scenario())
+
+
+def test_batch_endpoint_reports_each_record(standin):
+    from main import app
+
+    async def scenario():
+        ids = [str((await standin.participant_collection.insert_one({"full_name": f"p{i}", "email": f"{i}@x.y", "phone": "1"})).inserted_id) for i in range(2)]
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/scanned-tasks/batch", json={"records": [
+                {"task_id": "t1", "participant_qr": ids[0], "client_timestamp": "2026-10-18T10:00:00Z", "idempotency_key": "k1"},
+                {"task_id": "t1", "participant_qr": ids[1], "client_timestamp": "2026-10-18T10:00:00Z"},
+                {"task_id": "t1", "participant_qr": "unknown", "client_timestamp": "2026-10-18T10:00:00Z"},
+            ]})
+        assert response.status_code == 200
+        report = response.json()
+        assert (report["applied_count"], report["error_count"]) == (2, 1)
+        assert report["results"][2]["error"] == "Participant not found"
+
+    asyncio.run(scenario())
+
+
+def test_batches_are_refused_without_the_clock_index(standin, monkeypatch):
+    from main import app
+
+    async def failing_create_indexes(indexes):
+        raise OperationFailure("index build failed")
+
+    async def scenario():
+        participant = str((await standin.participant_collection.insert_one({"full_name": "p", "email": "p@x.y", "phone": "1"})).inserted_id)
+        body = {"records": [{"task_id": "t1", "participant_qr": participant, "client_timestamp": "2026-10-18T10:00:00Z"}]}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            monkeypatch.setattr(scanService, "_clock_index_ready", False)
+            monkeypatch.setattr(standin.scan_clock_collection, "create_indexes", failing_create_indexes)
+            assert (await client.post("/scanned-tasks/batch", json=body)).status_code == 503
+
+            monkeypatch.setattr(scanService, "OFFLINE_SCAN_BATCHES", False)
+            assert (await client.post("/scanned-tasks/batch", json=body)).status_code == 404
+        assert await get_scanned_ids("t1") == []
+
+    asyncio.run(scenario())
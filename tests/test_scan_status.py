@@ -0,0 +1,46 @@
+import asyncio
+import json
+import httpx
+from services.scanService import set_scan_status
+
+
+def client():
+    from main import app
+
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+async def seed(standin):
+    result = await standin.participant_collection.insert_many([
+        {"full_name": f"p{i}", "email": f"{i}@x.y", "phone": "1", "team": "a"} for i in range(3)
+    ])
+    ids = [str(inserted_id) for inserted_id in result.inserted_ids]
+    await set_scan_status("t1", ids[1], True)
+    return ids
+
+
+def test_participants_are_listed_with_their_scan_status(standin):
+    async def scenario():
+        ids = await seed(standin)
+        async with client() as http:
+            response = await http.get("/scanned-tasks/t1", params={"fields": "full_name"})
+            streamed = await http.get("/scanned-tasks/t1", params={"skip": 1, "limit": 1, "stream": "true"})
+        assert response.status_code == 200
+        assert response.json() == [
+            {"task_id": "t1", "participant_qr": ids[i], "full_name": f"p{i}", "scanned": i == 1} for i in range(3)
+        ]
+        assert [json.loads(line)["participant_qr"] for line in streamed.text.splitlines()] == [ids[1]]
+
+    asyncio.run(scenario())
+
+
+def test_page_past_the_end_is_empty(standin):
+    async def scenario():
+        async with client() as http:
+            assert (await http.get("/scanned-tasks/t1")).status_code == 404
+            await seed(standin)
+            response = await http.get("/scanned-tasks/t1", params={"skip": 10})
+        assert response.status_code == 200
+        assert response.json() == []
+
+    asyncio.run(scenario())